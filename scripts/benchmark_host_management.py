@@ -0,0 +1,185 @@
+"""
+Benchmark HostManagement discovery and orchestration against the offline simulator.
+
+Times find_folder_by_name, get_hosts_and_vms_from_folder, find_vms_with_system_name
+and the full main() flows for inventories of 10, 100 and 1000 VMs, and counts the
+vCenter round trips each one makes. Results can be saved with --output and compared
+with a saved baseline through --baseline; the script exits with status 1 when any
+measurement is slower than the baseline by more than --tolerance.
+
+    python scripts/benchmark_host_management.py
+    python scripts/benchmark_host_management.py --sizes 10 100 --output bench.json
+    python scripts/benchmark_host_management.py --baseline bench.json --tolerance 1.5
+
+The vm_reboot flow is left out by default because main() pauses 60 s between
+power off and power on in that branch.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cryptography.fernet import Fernet
+from services.box_location_index import BoxLocationIndex, set_watcher
+from services.credential_cache import CredentialCache
+from services.discovery_cache import DiscoveryCache
+from services.run_checkpoints import CheckpointStore
+from services.host_management import HostManagement
+from scripts.vcenter_simulator import FakeSshServer, SimulatedSessionPool, SimulatedVcenter
+
+VCENTER = 'vcenter-sim.lab'
+TARGET_BOX = 'OGF0'
+SSH_PORT = 2222
+
+FLOWS = {
+    'esx_reboot': {'esx_reboot': "Yes", 'vm_reboot': "No", 'updateadios': "Yes", 'adios_versions': "Roble"},
+    'vm_reboot': {'esx_reboot': "No", 'vm_reboot': "Yes", 'updateadios': "Yes", 'adios_versions': "Roble"},
+    'update_adios': {'esx_reboot': "No", 'vm_reboot': "No", 'updateadios': "Yes", 'adios_versions': "Roble"},
+}
+
+
+def layout(size, hosts_per_box, vms_per_host):
+    """Number of boxes needed for an inventory of about size VMs."""
+    per_box = hosts_per_box * vms_per_host
+    return max(1, size // per_box)
+
+
+def make_host_management(vcenter, work_dir, **options):
+    # Every measurement starts cold: no box index entry and no watcher left by an earlier vCenter
+    work_dir = tempfile.mkdtemp(dir=work_dir)
+    set_watcher(TARGET_BOX, None)
+    hm = HostManagement(
+        parallel_discovery=False,
+        box_index=BoxLocationIndex(os.path.join(work_dir, 'box_index.db')),
+        session_pool=SimulatedSessionPool({VCENTER: vcenter}),
+        credential_cache=CredentialCache(os.path.join(work_dir, 'credential_cache.db'), key=Fernet.generate_key()),
+        ssh_port=SSH_PORT,
+        discovery_cache=DiscoveryCache(),
+        checkpoint_store=CheckpointStore(os.path.join(work_dir, 'run_checkpoints.db')),
+        **options)
+    hm.all_data_centers = [{'vcenter_server': VCENTER, 'username': 'administrator', 'password': 'secret'}]
+    return hm
+
+
+def measure(vcenter, fn):
+    vcenter.reset_calls()
+    start_time = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start_time
+    return {'seconds': round(elapsed, 4), 'round_trips': sum(vcenter.calls.values())}
+
+
+def bench_discovery(size, args, work_dir):
+    vcenter = SimulatedVcenter.build(layout(size, args.hosts_per_box, args.vms_per_host), args.hosts_per_box,
+                                     args.vms_per_host, rpc_latency=args.rpc_latency)
+    content = vcenter.content
+    results = {}
+
+    hm = make_host_management(vcenter, work_dir)
+    folder = {}
+    results['find_folder_by_name'] = measure(
+        vcenter, lambda: folder.setdefault('obj', hm.find_folder_by_name(content, TARGET_BOX)))
+    results['get_hosts_and_vms_from_folder'] = measure(
+        vcenter, lambda: hm.get_hosts_and_vms_from_folder(content, folder['obj']))
+
+    # A fresh instance, so the name search pays for its own inventory load
+    hm = make_host_management(vcenter, work_dir)
+    results['find_vms_with_system_name'] = measure(
+        vcenter, lambda: hm.find_vms_with_system_name(content, TARGET_BOX + '_vm'))
+    return results
+
+
+def bench_flow(size, flow, args, work_dir):
+    vcenter = SimulatedVcenter.build(layout(size, args.hosts_per_box, args.vms_per_host), args.hosts_per_box,
+                                     args.vms_per_host, rpc_latency=args.rpc_latency, task_latency=args.task_latency,
+                                     reboot_time=args.reboot_time)
+    ssh_server = FakeSshServer(vcenter.box_ips(TARGET_BOX), port=SSH_PORT).start()
+    try:
+        hm = make_host_management(vcenter, work_dir)
+        hm.axcli_timeouts = {'initial': 30, 'stopped': 30, 'dnr': 30, 'ready': 30}
+        hm.adios_settle_time = args.settle_time
+        params = dict(FLOWS[flow], system=TARGET_BOX)
+        report = {}
+        result = measure(vcenter, lambda: report.update(hm.main(params)))
+        ready = report.get('ready_hosts', [])
+        result['hosts_ready'] = sum(1 for entry in ready if entry['result'] == 'success')
+        result['hosts'] = len(ready)
+        result['ssh_execs'] = sum(ssh_server.exec_counts.values())
+        result['property_fetches'] = report.get('property_fetches')
+        return result
+    finally:
+        ssh_server.stop()
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for size, measurements in results.items():
+        for name, result in measurements.items():
+            previous = baseline.get(size, {}).get(name)
+            if previous and result['seconds'] > previous['seconds'] * tolerance:
+                regressions.append(f"{name} @ {size} VMs: {result['seconds']:.3f} s vs {previous['seconds']:.3f} s")
+            if previous and result['round_trips'] > previous['round_trips']:
+                regressions.append(f"{name} @ {size} VMs: {result['round_trips']} round trips vs {previous['round_trips']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000], help="Inventory sizes in VMs")
+    parser.add_argument('--flows', nargs='+', default=['esx_reboot', 'update_adios'], choices=sorted(FLOWS))
+    parser.add_argument('--hosts-per-box', type=int, default=2)
+    parser.add_argument('--vms-per-host', type=int, default=5)
+    parser.add_argument('--rpc-latency', type=float, default=0.002, help="Seconds added to every vCenter round trip")
+    parser.add_argument('--task-latency', type=float, default=0.05, help="Seconds every vCenter task runs")
+    parser.add_argument('--reboot-time', type=float, default=0.2, help="Seconds a simulated ESX host stays down")
+    parser.add_argument('--settle-time', type=float, default=0.5,
+                        help="Seconds HostManagement waits after DNR before updating ADIOS (20 in production)")
+    parser.add_argument('--output', help="Write the results as JSON to this file")
+    parser.add_argument('--baseline', help="JSON results of an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=1.25, help="Allowed slowdown factor against the baseline")
+    parser.add_argument('--verbose', action='store_true', help="Show HostManagement log output")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+    work_dir = tempfile.mkdtemp(prefix='hm-bench-')
+    os.chdir(work_dir)   # main() writes its Logs/ folder to the working directory
+    if not args.verbose:
+        logging.disable(logging.CRITICAL)
+
+    results = {}
+    for size in args.sizes:
+        measurements = bench_discovery(size, args, work_dir)
+        for flow in args.flows:
+            measurements[f'main[{flow}]'] = bench_flow(size, flow, args, work_dir)
+        results[str(size)] = measurements
+
+    logging.disable(logging.NOTSET)
+    print(f"{'measurement':<36}{'VMs':>6}{'seconds':>10}{'round trips':>13}")
+    for size, measurements in results.items():
+        for name, result in measurements.items():
+            print(f"{name:<36}{size:>6}{result['seconds']:>10.3f}{result['round_trips']:>13}")
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if baseline:
+        with open(baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for regression in regressions:
+                print("  " + regression)
+            sys.exit(1)
+        print("\nNo regressions against baseline.")
+
+
+if __name__ == '__main__':
+    main()
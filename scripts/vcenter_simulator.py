@@ -0,0 +1,516 @@
+"""
+Offline stand-in for the vCenters, ESX hosts and VM consoles HostManagement talks to.
+
+SimulatedVcenter answers the pyVmomi calls the services make (PropertyCollector
+retrieval and WaitForUpdatesEx, container views, power / maintenance / reboot
+tasks) from an in-memory inventory, with a configurable latency per round trip
+and per task. FakeSshServer is a paramiko server that plays the axcli side of
+the ADIOS steps on loopback addresses. Neither needs network access or a lab.
+
+    vcenter = SimulatedVcenter.build(boxes=10, hosts_per_box=2, vms_per_host=5)
+    hm = HostManagement(session_pool=SimulatedSessionPool({'vc1': vcenter}), ...)
+"""
+
+import itertools
+import selectors
+import socket
+import threading
+import time
+import types
+from datetime import datetime, timezone
+import paramiko
+from pyVmomi import vim, vmodl
+
+PC = vmodl.query.PropertyCollector
+
+
+class SimulatedVcenter:
+    """In-memory inventory served through the pyVmomi stub interface (InvokeMethod / InvokeAccessor)."""
+
+    def __init__(self, rpc_latency=0.002, task_latency=0.05, reboot_time=0.2, boot_time=0.1):
+        self.rpc_latency = rpc_latency
+        self.task_latency = task_latency
+        self.reboot_time = reboot_time
+        self.boot_time = boot_time
+        self.objects = {}       # moId -> (managed object, {property path: value})
+        self.views = {}         # view moId -> (container, types)
+        self.tokens = {}        # RetrievePropertiesEx continuation token -> (remaining objects, page size)
+        self.collectors = {}    # private PropertyCollector moId -> {'filters', 'snapshot', 'version'}
+        self.calls = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.RLock()
+        self.content = vim.ServiceInstanceContent(
+            rootFolder=self.add(vim.Folder, 'group-d1', name='Datacenters'),
+            viewManager=vim.view.ViewManager('ViewManager', self),
+            propertyCollector=vmodl.query.PropertyCollector('propertyCollector', self))
+
+    # ----- inventory
+
+    def add(self, cls, moid, **properties):
+        obj = cls(moid, self)
+        with self.lock:
+            self.objects[moid] = (obj, properties)
+        return obj
+
+    def set(self, obj, path, value):
+        with self.lock:
+            self.objects[obj._moId][1][path] = value
+
+    def get(self, obj, path):
+        with self.lock:
+            value = self.objects[obj._moId][1].get(path)
+        return value() if callable(value) else value
+
+    @classmethod
+    def build(cls, boxes=3, hosts_per_box=2, vms_per_host=4, **options):
+        """
+        One datacenter with a host folder per box (OGF0, OGF1, ...), a compute resource
+        and host per ESX server, and the VMs in a separate VM folder per box. VM n on
+        host h of box b gets the loopback IP 127.<b // 250 + 1>.<b % 250>.<h * vms_per_host + n + 1>.
+        """
+        vcenter = cls(**options)
+        datacenter = vcenter.add(vim.Datacenter, 'datacenter-1', name='DC', parent=vcenter.content.rootFolder)
+        host_folder = vcenter.add(vim.Folder, 'group-h1', name='host', parent=datacenter)
+        vm_folder = vcenter.add(vim.Folder, 'group-v1', name='vm', parent=datacenter)
+
+        for b in range(boxes):
+            box = f'OGF{b}'
+            box_folder = vcenter.add(vim.Folder, f'group-h{b}00', name=box, parent=host_folder)
+            box_vm_folder = vcenter.add(vim.Folder, f'group-v{b}00', name=f'{box}-vms', parent=vm_folder)
+            for h in range(hosts_per_box):
+                name = f'esx{b}-{h}.lab'
+                compute_resource = vcenter.add(vim.ComputeResource, f'domain-s{b}-{h}', name=name, parent=box_folder)
+                host = vcenter.add(vim.HostSystem, f'host-{b}-{h}', name=name, parent=compute_resource,
+                                   **{'runtime.inMaintenanceMode': False, 'runtime.connectionState': 'connected',
+                                      'runtime.bootTime': datetime.now(timezone.utc)})
+                pool = vcenter.add(vim.ResourcePool, f'resgroup-{b}-{h}', name='Resources', parent=compute_resource)
+                vms = []
+                for n in range(vms_per_host):
+                    ip = f'127.{b // 250 + 1}.{b % 250}.{h * vms_per_host + n + 1}'
+                    vms.append(vcenter.add(vim.VirtualMachine, f'vm-{b}-{h}-{n}', name=f'{box}_vm{h}{n}',
+                                           parent=box_vm_folder, **{
+                                               'guest.ipAddress': ip,
+                                               'guest.toolsRunningStatus': 'guestToolsRunning',
+                                               'runtime.powerState': 'poweredOn'}))
+                vcenter.set(compute_resource, 'resourcePool', pool)
+                vcenter.set(compute_resource, 'host', vim.HostSystem.Array([host]))
+                vcenter.set(pool, 'vm', vim.VirtualMachine.Array(vms))
+                vcenter.set(host, 'vm', vim.VirtualMachine.Array(vms))
+        return vcenter
+
+    def box_ips(self, box):
+        """Guest IPs of every VM in a box, for starting SSH servers."""
+        with self.lock:
+            return [props['guest.ipAddress'] for obj, props in self.objects.values()
+                    if isinstance(obj, vim.VirtualMachine) and props.get('name', '').startswith(box + '_')]
+
+    def reset_calls(self):
+        with self.lock:
+            self.calls = {}
+
+    # ----- stub interface
+
+    def _count(self, name):
+        with self.lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+        if self.rpc_latency:
+            time.sleep(self.rpc_latency)
+
+    def InvokeAccessor(self, mo, info):
+        self._count('get:' + info.name)
+        with self.lock:
+            if mo._moId in self.views:
+                return self._view_objects(mo)
+            properties = self.objects[mo._moId][1]
+        if info.name in properties:
+            return self.get(mo, info.name)
+        prefix = info.name + '.'
+        nested = {path[len(prefix):]: path for path in properties if path.startswith(prefix)}
+        if not nested:
+            return None
+        return types.SimpleNamespace(**{attr: self.get(mo, path) for attr, path in nested.items()})
+
+    def InvokeMethod(self, mo, info, args):
+        self._count(info.wsdlName)
+        return getattr(self, info.wsdlName)(mo, *args)
+
+    # ----- views
+
+    def _descendants(self, root, types_, found):
+        with self.lock:
+            objects = list(self.objects.values())
+        for obj, properties in objects:
+            parent = properties.get('parent')
+            if parent is not None and parent._moId == root._moId:
+                if any(isinstance(obj, t) for t in types_):
+                    found.append(obj)
+                self._descendants(obj, types_, found)
+        return found
+
+    def _view_objects(self, view):
+        container, types_ = self.views[view._moId]
+        return self._descendants(container, types_, [])
+
+    def CreateContainerView(self, mo, container, types_, recursive):
+        if container._moId not in self.objects:
+            raise vmodl.fault.ManagedObjectNotFound(obj=container)
+        view = vim.view.ContainerView(f'view-{next(self.ids)}', self)
+        with self.lock:
+            self.views[view._moId] = (container, types_)
+        return view
+
+    def DestroyView(self, mo):
+        with self.lock:
+            self.views.pop(mo._moId, None)
+
+    # ----- PropertyCollector retrieval
+
+    def _spec_objects(self, object_spec):
+        objs = []
+        if object_spec.selectSet and object_spec.obj._moId in self.views:
+            objs += self._view_objects(object_spec.obj)
+        if not object_spec.skip:
+            objs.append(object_spec.obj)
+        return objs
+
+    def _properties(self, obj, prop_specs):
+        paths = [path for spec in prop_specs if isinstance(obj, spec.type) for path in spec.pathSet]
+        return {path: self.get(obj, path) for path in paths}
+
+    def RetrievePropertiesEx(self, mo, specs, options):
+        out = []
+        for spec in specs:
+            for object_spec in spec.objectSet:
+                for obj in self._spec_objects(object_spec):
+                    if obj._moId not in self.objects:
+                        raise vmodl.fault.ManagedObjectNotFound(obj=obj)
+                    properties = self._properties(obj, spec.propSet)
+                    out.append(PC.ObjectContent(obj=obj, propSet=[
+                        vmodl.DynamicProperty(name=path, val=value) for path, value in properties.items() if value is not None]))
+        return self._page(out, options.maxObjects or 100)
+
+    def _page(self, out, size):
+        if len(out) <= size:
+            return PC.RetrieveResult(objects=out)
+        token = f'token-{next(self.ids)}'
+        with self.lock:
+            self.tokens[token] = (out[size:], size)
+        return PC.RetrieveResult(objects=out[:size], token=token)
+
+    def ContinueRetrievePropertiesEx(self, mo, token):
+        with self.lock:
+            out, size = self.tokens.pop(token)
+        return self._page(out, size)
+
+    def CancelRetrievePropertiesEx(self, mo, token):
+        with self.lock:
+            self.tokens.pop(token, None)
+
+    # ----- PropertyCollector updates
+
+    def CreatePropertyCollector(self, mo):
+        collector = vmodl.query.PropertyCollector(f'session[{next(self.ids)}]', self)
+        with self.lock:
+            self.collectors[collector._moId] = {'filters': [], 'snapshot': {}, 'version': 0}
+        return collector
+
+    def DestroyPropertyCollector(self, mo):
+        with self.lock:
+            self.collectors.pop(mo._moId, None)
+
+    def CreateFilter(self, mo, spec, partial_updates):
+        for object_spec in spec.objectSet:
+            if not object_spec.selectSet and object_spec.obj._moId not in self.objects:
+                raise vmodl.fault.ManagedObjectNotFound(obj=object_spec.obj)
+        property_filter = vmodl.query.PropertyCollector.Filter(f'filter-{next(self.ids)}', self)
+        with self.lock:
+            self.collectors[mo._moId]['filters'].append((property_filter, spec))
+        return property_filter
+
+    def DestroyPropertyFilter(self, mo):
+        with self.lock:
+            for collector in self.collectors.values():
+                collector['filters'] = [(f, spec) for f, spec in collector['filters'] if f._moId != mo._moId]
+
+    def _snapshot(self, filters):
+        snapshot = {}
+        for property_filter, spec in filters:
+            for object_spec in spec.objectSet:
+                for obj in self._spec_objects(object_spec):
+                    if obj._moId not in self.objects:
+                        snapshot[obj._moId] = None
+                    else:
+                        snapshot[obj._moId] = (obj, self._properties(obj, spec.propSet))
+        return snapshot
+
+    def _changes(self, collector_id, version):
+        collector = self.collectors[collector_id]
+        if version == '':
+            collector['snapshot'] = {}
+        current = self._snapshot(collector['filters'])
+        previous = collector['snapshot']
+        updates = []
+        for moid, entry in current.items():
+            old = previous.get(moid)
+            if entry is None:
+                if old is not None:
+                    updates.append(PC.ObjectUpdate(kind='leave', obj=old[0]))
+                continue
+            obj, properties = entry
+            if old is None:
+                updates.append(PC.ObjectUpdate(kind='enter', obj=obj, changeSet=[
+                    PC.Change(name=path, op='assign', val=value) for path, value in properties.items() if value is not None]))
+            else:
+                changes = [PC.Change(name=path, op='assign', val=value)
+                           for path, value in properties.items() if old[1].get(path) != value]
+                if changes:
+                    updates.append(PC.ObjectUpdate(kind='modify', obj=obj, changeSet=changes))
+        for moid, old in previous.items():
+            if moid not in current and old is not None:
+                updates.append(PC.ObjectUpdate(kind='leave', obj=old[0]))
+        collector['snapshot'] = {moid: entry for moid, entry in current.items() if entry is not None}
+        if not updates:
+            return None
+        collector['version'] += 1
+        return PC.UpdateSet(version=str(collector['version']), filterSet=[
+            PC.FilterUpdate(filter=vmodl.query.PropertyCollector.Filter('filter', self), objectSet=updates)])
+
+    def WaitForUpdatesEx(self, mo, version, options):
+        max_wait = options.maxWaitSeconds if options is not None and options.maxWaitSeconds is not None else 3600
+        deadline = time.time() + max_wait
+        while True:
+            with self.lock:
+                update_set = self._changes(mo._moId, version)
+            if update_set is not None or time.time() >= deadline:
+                return update_set
+            version = str(self.collectors[mo._moId]['version'])
+            time.sleep(0.005)
+
+    # ----- tasks
+
+    def _task(self, apply):
+        started = time.time()
+        applied = []
+
+        def state():
+            if time.time() - started < self.task_latency:
+                return 'running'
+            if not applied:
+                applied.append(True)
+                apply()
+            return 'success'
+
+        return self.add(vim.Task, f'task-{next(self.ids)}', **{'info.state': state, 'info.error': None})
+
+    def PowerOffVM_Task(self, mo):
+        def apply():
+            self.set(mo, 'runtime.powerState', 'poweredOff')
+            self.set(mo, 'guest.toolsRunningStatus', 'guestToolsNotRunning')
+        return self._task(apply)
+
+    def PowerOnVM_Task(self, mo, *args):
+        def apply():
+            self.set(mo, 'runtime.powerState', 'poweredOn')
+            threading.Timer(self.boot_time, self.set, (mo, 'guest.toolsRunningStatus', 'guestToolsRunning')).start()
+        return self._task(apply)
+
+    def EnterMaintenanceMode_Task(self, mo, *args):
+        return self._task(lambda: self.set(mo, 'runtime.inMaintenanceMode', True))
+
+    def ExitMaintenanceMode_Task(self, mo, *args):
+        return self._task(lambda: self.set(mo, 'runtime.inMaintenanceMode', False))
+
+    def RebootHost_Task(self, mo, force):
+        def cycle():
+            time.sleep(self.task_latency)
+            self.set(mo, 'runtime.connectionState', 'notResponding')
+            time.sleep(self.reboot_time)
+            self.set(mo, 'runtime.bootTime', datetime.now(timezone.utc))
+            self.set(mo, 'runtime.connectionState', 'connected')
+        threading.Thread(target=cycle, daemon=True).start()
+        return self._task(lambda: None)
+
+    def CurrentTime(self, mo):
+        return time.time()
+
+
+class SimulatedServiceInstance:
+    """Just enough of vim.ServiceInstance for the session pool and the box location watcher."""
+
+    def __init__(self, vcenter):
+        self._stub = vcenter
+        self.content = vcenter.content
+
+    def RetrieveContent(self):
+        return self.content
+
+    def CurrentTime(self):
+        return time.time()
+
+
+class SimulatedSessionPool:
+    """Drop-in for VcenterSessionPool; vcenters maps server name -> SimulatedVcenter."""
+
+    def __init__(self, vcenters):
+        self.instances = {server: SimulatedServiceInstance(vcenter) for server, vcenter in vcenters.items()}
+
+    def get(self, server, username, password):
+        if server not in self.instances:
+            raise ConnectionError(f"Unknown simulated vCenter {server}")
+        return self.instances[server]
+
+    def close_all(self):
+        pass
+
+
+class FakeAxcliHost:
+    """Dispatcher state of one VM; every command moves it along after a configurable delay."""
+
+    def __init__(self, stop_time=0.1, dnr_time=0.1, install_time=0.2, ready_time=0.2):
+        self.state = 'Running'
+        self.stop_time = stop_time
+        self.dnr_time = dnr_time
+        self.install_time = install_time
+        self.ready_time = ready_time
+        self.lock = threading.Lock()
+
+    def _set_later(self, delay, state):
+        def apply():
+            with self.lock:
+                self.state = state
+        threading.Timer(delay, apply).start()
+
+    def state_line(self):
+        with self.lock:
+            return f"STATE: {self.state}"
+
+    def run(self, command, channel):
+        """Plays one exec request; returns the exit status."""
+        if 'while' in command and 'axcli state' in command:
+            # AxcliStateWatcher loop: print the state whenever it changes until the channel goes away
+            previous = None
+            while not channel.closed and channel.get_transport().is_active():
+                line = self.state_line()
+                if line != previous:
+                    channel.sendall((line + '\r\n').encode())
+                    previous = line
+                time.sleep(0.02)
+            return 0
+        if command.startswith('axcli state'):
+            channel.sendall((self.state_line() + '\n').encode())
+        elif command.startswith('kill'):
+            self._set_later(self.stop_time, 'Stopped')
+        elif command.startswith('axcli dexit'):
+            self._set_later(self.dnr_time, 'DNR')
+            channel.sendall(b'Dispatcher exit requested\n')
+        elif 'axinstall' in command:
+            time.sleep(self.install_time)
+        elif command.startswith('axcli adiosx config'):
+            self._set_later(self.ready_time, 'Ready')
+        return 0
+
+
+class _AxcliServerInterface(paramiko.ServerInterface):
+
+    def __init__(self, server, address):
+        self.server = server
+        self.address = address
+
+    def get_allowed_auths(self, username):
+        return 'password'
+
+    def check_auth_password(self, username, password):
+        if username == self.server.username and password == self.server.password:
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_channel_request(self, kind, chanid):
+        return paramiko.OPEN_SUCCEEDED if kind == 'session' else paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_pty_request(self, channel, term, width, height, pixelwidth, pixelheight, modes):
+        return True
+
+    def check_channel_exec_request(self, channel, command):
+        threading.Thread(target=self.server.handle_exec, args=(self.address, channel, command.decode()),
+                         daemon=True).start()
+        return True
+
+
+class FakeSshServer:
+    """
+    paramiko SSH server listening on port of every given loopback address, one
+    FakeAxcliHost per address. Accepts one username/password pair only, so
+    credential discovery has to work through the candidate list.
+    """
+
+    def __init__(self, addresses, port=2222, username='root', password='D@nger0us1', **host_options):
+        self.port = port
+        self.username = username
+        self.password = password
+        self.hosts = {address: FakeAxcliHost(**host_options) for address in addresses}
+        self.host_key = paramiko.RSAKey.generate(2048)
+        self.selector = selectors.DefaultSelector()
+        self.stop_event = threading.Event()
+        self.transports = []
+        self.exec_counts = {}
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def start(self):
+        for address in self.hosts:
+            listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            listener.bind((address, self.port))
+            listener.listen(16)
+            listener.setblocking(False)
+            self.selector.register(listener, selectors.EVENT_READ, address)
+        self.thread = threading.Thread(target=self._accept_loop, name='fake-ssh', daemon=True)
+        self.thread.start()
+        return self
+
+    def _accept_loop(self):
+        while not self.stop_event.is_set():
+            for key, _ in self.selector.select(timeout=0.1):
+                try:
+                    sock, _ = key.fileobj.accept()
+                except OSError:
+                    continue
+                sock.setblocking(True)
+                threading.Thread(target=self._serve, args=(sock, key.data), daemon=True).start()
+
+    def _serve(self, sock, address):
+        transport = paramiko.Transport(sock)
+        transport.add_server_key(self.host_key)
+        with self.lock:
+            self.transports.append(transport)
+        try:
+            transport.start_server(server=_AxcliServerInterface(self, address))
+        except (paramiko.SSHException, EOFError, OSError):
+            # Plain TCP readiness probes connect and hang up without a handshake
+            transport.close()
+
+    def handle_exec(self, address, channel, command):
+        # paramiko only acknowledges the exec request after check_channel_exec_request
+        # returns; closing the channel before that makes the client see "Channel closed"
+        time.sleep(0.02)
+        with self.lock:
+            self.exec_counts[address] = self.exec_counts.get(address, 0) + 1
+        try:
+            status = self.hosts[address].run(command, channel)
+            channel.send_exit_status(status)
+        except (OSError, EOFError, paramiko.SSHException):
+            pass
+        finally:
+            channel.close()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        for key in list(self.selector.get_map().values()):
+            key.fileobj.close()
+        self.selector.close()
+        with self.lock:
+            transports = list(self.transports)
+        for transport in transports:
+            transport.close()
@@ -3,13 +3,15 @@ import requests
 import re
 import os
 from typing import Optional, Tuple
+from services.qtest_client import get_qtest_client
 
 class AuthenticationService:
     """Service for handling Bearer Token Authentication"""
     
-    def __init__(self):
-        self.api_base_url = os.getenv('QTEST_API_BASE_URL', 'https://qtest.gtie.dell.com/api/v3')
-        self.project_id = os.getenv('QTEST_PROJECT_ID', '442')
+    def __init__(self, client=None):
+        self.client = client or get_qtest_client()
+        self.api_base_url = self.client.base_url
+        self.project_id = self.client.project_id
     
     def validate_bearer_token_format(self, token_string: str) -> bool:
         """Validate that the token follows the format 'Bearer <token>'"""
@@ -41,8 +43,7 @@ class AuthenticationService:
             
             # Make a simple API call to test the token
             # Using projects endpoint as it's usually accessible
-            test_url = f"{self.api_base_url}/projects"
-            response = requests.get(test_url, headers=headers, timeout=10)
+            response = self.client.get("projects", project=False, headers=headers, timeout=10)
             
             if response.status_code == 200:
                 return True, "Token is valid"
@@ -0,0 +1,87 @@
+import shlex
+import socket
+import time
+
+
+STATE_COMMAND = "axcli state | grep STATE | awk 'NR==1'"
+
+# Seconds allowed for each dispatcher phase of a host
+PHASE_TIMEOUTS = {
+    'initial': 60,
+    'stopped': 300,
+    'dnr': 600,
+    'ready': 1800,
+}
+
+
+class AxcliStateWatcher:
+    """
+    Follows the dispatcher state of one host through a single remote shell loop.
+
+    The loop runs axcli state every interval seconds on the host itself and only
+    prints a line when the state changes, so the local side just reads transitions
+    from one channel instead of opening a channel per poll. It runs under a pty
+    (closing the channel hangs it up) and under timeout(1), so it can never
+    outlive max_duration even if the connection is lost.
+    """
+
+    def __init__(self, client, hostname, interval=1, max_duration=7200):
+        self.client = client
+        self.hostname = hostname
+        self.interval = interval
+        self.max_duration = max_duration
+        self.state = None
+        self.channel = None
+        self._buffer = ''
+
+    def command(self):
+        loop = (
+            'prev=""; while :; do '
+            f'state=$({STATE_COMMAND}); '
+            'if [ "$state" != "$prev" ]; then echo "$state"; prev="$state"; fi; '
+            f'sleep {self.interval}; done'
+        )
+        return f"timeout {int(self.max_duration)} sh -c {shlex.quote(loop)}"
+
+    def start(self):
+        self.channel = self.client.get_transport().open_session()
+        self.channel.get_pty()
+        self.channel.exec_command(self.command())
+        return self
+
+    def _next_line(self, timeout):
+        """Next non-empty line of output, or None if nothing arrived within timeout."""
+        deadline = time.time() + timeout
+        while '\n' not in self._buffer:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return None
+            self.channel.settimeout(remaining)
+            try:
+                chunk = self.channel.recv(4096)
+            except socket.timeout:
+                return None
+            if not chunk:
+                raise RuntimeError(f"axcli state watch on {self.hostname} ended unexpectedly")
+            self._buffer += chunk.decode(errors='replace')
+        line, self._buffer = self._buffer.split('\n', 1)
+        return line.strip() or self._next_line(max(0, deadline - time.time()))
+
+    def wait_for(self, predicate, timeout, phase, cancel_event=None):
+        """Blocks until predicate(state) holds; raises TimeoutError once the phase deadline passes."""
+        deadline = time.time() + timeout
+        while self.state is None or not predicate(self.state):
+            if cancel_event is not None and cancel_event.is_set():
+                raise TimeoutError(f"Waiting for {phase} on {self.hostname} was cancelled")
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise TimeoutError(f"{self.hostname} did not reach {phase} within {timeout} seconds "
+                                   f"(last state: {self.state})")
+            line = self._next_line(min(remaining, 1))
+            if line is not None:
+                self.state = line
+        return self.state
+
+    def close(self):
+        if self.channel is not None:
+            self.channel.close()
@@ -0,0 +1,208 @@
+import json
+import logging
+import sqlite3
+import threading
+from pyVmomi import vim, vmodl
+from services.vcenter_inventory import VcenterInventory, inventory_property_specs, view_object_spec
+
+
+DEFAULT_DB_PATH = 'box_index.db'
+
+logger = logging.getLogger(__name__)
+
+
+def moref_to_str(obj):
+    return f"{obj._wsdlName}:{obj._moId}"
+
+
+def moref_from_str(value, stub):
+    wsdl_name, moid = value.split(':', 1)
+    return getattr(vim, wsdl_name)(moid, stub)
+
+
+class BoxLocationIndex:
+    """SQLite index of the vCenter, folder, hosts and VMs that make up each box."""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self.init_db()
+
+    def init_db(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS box_location (
+                box_name TEXT PRIMARY KEY,
+                vcenter_server TEXT NOT NULL,
+                folder_moref TEXT,
+                host_morefs TEXT NOT NULL,
+                vm_morefs TEXT NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def lookup(self, box_name):
+        conn = sqlite3.connect(self.db_path)
+        row = conn.execute('''
+            SELECT vcenter_server, folder_moref, host_morefs, vm_morefs
+            FROM box_location WHERE box_name = ?
+        ''', (box_name,)).fetchone()
+        conn.close()
+        if row is None:
+            return None
+        return {
+            'box_name': box_name,
+            'vcenter_server': row[0],
+            'folder_moref': row[1],
+            'host_morefs': json.loads(row[2]),
+            'vm_morefs': json.loads(row[3]),
+        }
+
+    def record(self, box_name, vcenter_server, folder, hosts, vms):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('''
+            INSERT OR REPLACE INTO box_location
+                (box_name, vcenter_server, folder_moref, host_morefs, vm_morefs, updated_at)
+            VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ''', (
+            box_name,
+            vcenter_server,
+            moref_to_str(folder) if folder is not None else None,
+            json.dumps(sorted(moref_to_str(host) for host in hosts)),
+            json.dumps(sorted(moref_to_str(vm) for vm in vms)),
+        ))
+        conn.commit()
+        conn.close()
+
+    def forget(self, box_name):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('DELETE FROM box_location WHERE box_name = ?', (box_name,))
+        conn.commit()
+        conn.close()
+
+
+class BoxLocationWatcher:
+    """
+    Keeps the cached MoRefs of one box current through a private PropertyCollector.
+
+    The first refresh returns the full state of the watched objects; later refreshes
+    pass the last WaitForUpdatesEx version and only receive what changed since.
+    Any watched object leaving the inventory marks the entry stale.
+    """
+
+    def __init__(self, si, content, entry):
+        self.si = si
+        self.content = content
+        self.vcenter_server = entry['vcenter_server']
+        self.inventory = VcenterInventory(content)
+        self.collector = content.propertyCollector.CreatePropertyCollector()
+        self.version = ''
+        self.view = None
+        self.watched = set()
+        self.lock = threading.Lock()
+
+        stub = si._stub
+        self.folder = moref_from_str(entry['folder_moref'], stub) if entry['folder_moref'] else None
+        self.hosts = [moref_from_str(value, stub) for value in entry['host_morefs']]
+        watched = [moref_from_str(value, stub) for value in entry['vm_morefs']]
+
+        try:
+            if self.folder is not None:
+                # New hosts or VMs dropped into the box folder show up as 'enter' updates
+                self.view = self.inventory.create_view(self.folder)
+                self._add_filter([view_object_spec(self.view)])
+                watched.append(self.folder)
+            else:
+                watched.extend(self.hosts)
+            self.watch(watched)
+        except Exception:
+            self.close()
+            raise
+
+    def _add_filter(self, object_specs):
+        filter_spec = vmodl.query.PropertyCollector.FilterSpec(
+            objectSet=object_specs, propSet=inventory_property_specs())
+        self.collector.CreateFilter(filter_spec, partialUpdates=True)
+
+    def watch(self, objs):
+        self.watched.update(obj._moId for obj in objs)
+        if objs:
+            self._add_filter([vmodl.query.PropertyCollector.ObjectSpec(obj=obj, skip=False) for obj in objs])
+
+    def refresh(self):
+        """Apply pending updates without blocking; returns False once the entry is stale."""
+        with self.lock:
+            while True:
+                if not self._drain_updates():
+                    return False
+                # Resource pools and VMs that appeared on the box's hosts since the last refresh
+                unwatched = self._unwatched()
+                if not unwatched:
+                    return True
+                self.watch(unwatched)
+
+    def _unwatched(self):
+        hosts = self.current_hosts()
+        pools = [self.inventory.value(host, 'resourcePool') for host in hosts]
+        referenced = [pool for pool in pools if pool is not None] + list(self.inventory.vms_of(hosts))
+        return [obj for obj in referenced if obj._moId not in self.watched and self.inventory.get(obj) is None]
+
+    def _drain_updates(self):
+        options = vmodl.query.PropertyCollector.WaitOptions(maxWaitSeconds=0)
+        while True:
+            update_set = self.collector.WaitForUpdatesEx(self.version, options)
+            self.inventory.stats['calls'] += 1
+            if update_set is None:
+                return True
+            self.version = update_set.version
+            for filter_update in update_set.filterSet:
+                for object_update in filter_update.objectSet:
+                    if object_update.kind == 'leave' or any(
+                            isinstance(missing.fault, vmodl.fault.ManagedObjectNotFound)
+                            for missing in object_update.missingSet):
+                        return False
+                    self.inventory.apply_update(object_update)
+            if not update_set.truncated:
+                return True
+
+    def current_hosts(self):
+        if self.folder is not None:
+            return {
+                row['obj'] for row in self.inventory.descendants(self.folder)
+                if row['type'] in ('ComputeResource', 'ClusterComputeResource', 'HostSystem')
+            }
+        return set(self.hosts)
+
+    def hosts_and_vms(self):
+        if self.folder is not None:
+            return self.inventory.hosts_and_vms(self.folder)
+        hosts = self.current_hosts()
+        return hosts, self.inventory.vms_of(hosts)
+
+    def close(self):
+        try:
+            if self.view is not None:
+                self.view.Destroy()
+            self.collector.DestroyPropertyCollector()
+        except Exception as e:
+            logger.debug("Error closing box watcher: %s", e)
+
+
+# Watchers stay alive between runs in the same process so repeat lookups only ask for deltas
+_watchers = {}
+_watchers_lock = threading.Lock()
+
+
+def get_watcher(box_name):
+    with _watchers_lock:
+        return _watchers.get(box_name)
+
+
+def set_watcher(box_name, watcher):
+    with _watchers_lock:
+        previous = _watchers.pop(box_name, None)
+        if watcher is not None:
+            _watchers[box_name] = watcher
+    if previous is not None and previous is not watcher:
+        previous.close()
@@ -0,0 +1,77 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from services.vcenter_inventory import SharedInventories
+
+
+class BoxScheduler:
+    """
+    Runs host management for a batch of boxes with bounded parallelism.
+
+    At most max_parallel boxes run at once, and at most per_vcenter of them run
+    their power/reboot/ready operations against the same vCenter; discovery is
+    not throttled per vCenter since the owning vCenter is only known after it.
+    Every box gets its own HostManagement built by make_host_management, which
+    is expected to hand out the shared vCenter session pool; the boxes of a batch
+    also share one loaded inventory per vCenter session, so discovery loads each
+    vCenter once per batch instead of once per box.
+    """
+
+    def __init__(self, make_host_management, max_parallel=4, per_vcenter=2):
+        self.make_host_management = make_host_management
+        self.max_parallel = max(1, int(max_parallel))
+        self.per_vcenter = max(1, int(per_vcenter))
+        self.vcenter_semaphores = {}
+        self.lock = threading.Lock()
+        self.status = {}
+
+    @contextmanager
+    def vcenter_slot(self, vcenter_server):
+        with self.lock:
+            semaphore = self.vcenter_semaphores.setdefault(vcenter_server, threading.Semaphore(self.per_vcenter))
+        with semaphore:
+            yield
+
+    def run(self, box_names, host_management_dict, progress=None):
+        """Returns the aggregated report: overall counts plus each box's run report."""
+        box_names = list(dict.fromkeys(name.strip().upper() for name in box_names if name.strip()))
+        self.status = {box: 'queued' for box in box_names}
+        inventories = SharedInventories()
+        start_time = time.time()
+
+        def report(box, message):
+            with self.lock:
+                self.status[box] = message
+                summary = self.summary()
+            if progress is not None:
+                progress(summary)
+
+        def run_box(box):
+            params = dict(host_management_dict, system=box)
+            try:
+                host_management = self.make_host_management()
+                host_management.shared_inventories = inventories
+                result = host_management.main(params, lambda message: report(box, message), self.vcenter_slot)
+            except Exception as e:
+                logging.error(f"Host management failed for {box}: {e}")
+                report(box, 'failed')
+                return {'box': box, 'error': str(e)}
+            report(box, 'done')
+            return result
+
+        with ThreadPoolExecutor(max_workers=self.max_parallel, thread_name_prefix="box-scheduler") as executor:
+            results = dict(zip(box_names, executor.map(run_box, box_names)))
+
+        return {
+            'boxes': results,
+            'total': len(box_names),
+            'failed': sorted(box for box, state in self.status.items() if state == 'failed'),
+            'duration': round(time.time() - start_time, 1),
+        }
+
+    def summary(self):
+        done = sum(1 for state in self.status.values() if state in ('done', 'failed'))
+        running = [f"{box}: {state}" for box, state in self.status.items() if state not in ('queued', 'done', 'failed')]
+        return f"{done}/{len(self.status)} boxes finished" + (f" | {'; '.join(running)}" if running else "")
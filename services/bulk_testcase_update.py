@@ -0,0 +1,119 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from services.fetch_testcase import Testcase
+from services.update_test_case import Updatetestcase
+from services.testcase_context import TestcaseContext
+
+
+# update_dict key -> (key in Testcase.required_fields output, label shown to the user)
+UPDATABLE_FIELDS = {
+    'test_case_status': ('test_case_status', "Test Case Status"),
+    'automation_status': ('automation_status', "Automation Status"),
+    'testcase_automation_developer': ('automation_developer', "Automation Developer"),
+    'assigned_to': ('assigned_to_value', "Assigned To"),
+    'automation_target_release_date': ('automation_release_date', "Target Release Date"),
+}
+
+
+def normalize_testcase_ids(text):
+    """'123, TC-456' -> ['TC-123', 'TC-456'], without duplicates."""
+    ids = []
+    for item in text.split(','):
+        tc = item.strip()
+        if not tc:
+            continue
+        if not tc.startswith("TC-"):
+            tc = "TC-" + tc
+        if tc not in ids:
+            ids.append(tc)
+    return ids
+
+
+class BulkTestcaseUpdate:
+    """
+    Applies the same edit to many test cases with a bounded pool of workers.
+
+    Every test case is resolved once into a TestcaseContext; its payload is used
+    both to work out which fields actually change and as the body of the PUT, and
+    its numeric id by the attachment and test step calls. Each worker handles
+    its test case end to end (fields, attachments, test steps) and returns one
+    result row. Nothing here touches Streamlit, so it is safe to run off the
+    main thread.
+    """
+
+    def __init__(self, auth_headers=None, max_workers=8, updater=None):
+        self.updater = updater or Updatetestcase(auth_headers)
+        self.max_workers = max_workers
+
+    def plan(self, current, changes):
+        """
+        Returns (update_dict, field_changes) for one test case.
+
+        changes holds the requested values keyed like update_dict; fields already
+        at the requested value are left out. field_changes lists (label, old, new).
+        """
+        update_dict = {}
+        field_changes = []
+        for key, new_value in changes.items():
+            current_key, label = UPDATABLE_FIELDS[key]
+            old_value = current.get(current_key, '')
+            if key == 'assigned_to':
+                old_value = old_value.strip("[]")
+            if key == 'automation_target_release_date':
+                # qTest stores a timestamp; only the date is compared and shown
+                new_date = new_value.split("T")[0]
+                if old_value != new_date:
+                    update_dict[key] = new_value
+                    field_changes.append((label, old_value or 'None', new_date))
+                continue
+            if old_value != new_value:
+                update_dict[key] = new_value
+                field_changes.append((label, old_value, new_value))
+        return update_dict, field_changes
+
+    def update_one(self, tc, changes, remove_attachment=False, attachment=None, steps_text=None):
+        result = {'test_case': tc, 'status': 'unchanged', 'fields': [], 'attachments': None,
+                  'steps': None, 'error': None}
+        start_time = time.time()
+        try:
+            context = TestcaseContext(self.updater, tc)
+            update_dict = {}
+            if changes:
+                # Attachment and test step only edits need no payload; the id may come from the id cache
+                current = Testcase.required_fields(self.updater, context.data)
+                update_dict, result['fields'] = self.plan(current, changes)
+
+            if update_dict:
+                update_dict['test_case_id'] = tc
+                response = self.updater.update_test_case(update_dict, context)
+                if response.status_code not in (200, 201):
+                    raise RuntimeError(f"Update failed (Status: {response.status_code})")
+                result['status'] = 'updated'
+
+            if remove_attachment:
+                result['attachments'] = self.updater.remove_attachments(context)
+            elif attachment is not None:
+                file_name, file_data = attachment
+                result['attachments'] = {'file_name': file_name,
+                                         'status_code': self.updater.update_attachments(context, file_name, file_data)}
+
+            if steps_text:
+                self.updater.add_test_steps(context, steps_text)
+                result['steps'] = 'updated'
+            if result['attachments'] is not None or result['steps']:
+                result['status'] = 'updated'
+        except Exception as e:
+            result['status'] = 'error'
+            result['error'] = str(e)
+        result['duration'] = round(time.time() - start_time, 2)
+        return result
+
+    def run(self, testcase_ids, changes, remove_attachment=False, attachment=None, steps_text=None):
+        """Updates every test case in testcase_ids; returns their result rows in input order."""
+        if not testcase_ids:
+            return []
+        workers = min(self.max_workers, len(testcase_ids))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="testcase-update") as executor:
+            futures = [executor.submit(self.update_one, tc, changes, remove_attachment, attachment, steps_text)
+                       for tc in testcase_ids]
+            return [future.result() for future in futures]
@@ -0,0 +1,98 @@
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from cryptography.fernet import Fernet, InvalidToken
+
+
+DEFAULT_DB_PATH = 'credential_cache.db'
+DEFAULT_KEY_PATH = 'credential_cache.key'
+DEFAULT_TTL = 7 * 24 * 3600
+
+_keys = {}   # key_path -> key, loaded once per process
+_keys_lock = threading.Lock()
+
+
+def load_key(key_path=DEFAULT_KEY_PATH):
+    """Fernet key from CREDENTIAL_CACHE_KEY, else from key_path (generated on first use)."""
+    key = os.getenv('CREDENTIAL_CACHE_KEY')
+    if key:
+        return key.encode()
+    with _keys_lock:
+        if key_path not in _keys:
+            _keys[key_path] = _read_or_create_key(key_path)
+        return _keys[key_path]
+
+
+def _read_or_create_key(key_path):
+    if os.path.exists(key_path):
+        with open(key_path, 'rb') as f:
+            return f.read().strip()
+    # Write the key in full before it appears under key_path; another process may get there first
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(key_path)), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(Fernet.generate_key())
+        os.chmod(tmp_path, 0o600)
+        try:
+            os.link(tmp_path, key_path)
+        except FileExistsError:
+            pass
+    finally:
+        os.unlink(tmp_path)
+    with open(key_path, 'rb') as f:
+        return f.read().strip()
+
+
+class CredentialCache:
+    """SQLite cache of the last working SSH login per VM, with the password encrypted at rest."""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, ttl=DEFAULT_TTL, key=None):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.fernet = Fernet(key or load_key())
+        self.init_db()
+
+    def init_db(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS vm_credential (
+                host TEXT PRIMARY KEY,
+                username TEXT NOT NULL,
+                password TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def get(self, host):
+        """Returns (username, password) for host, or None when missing, expired or unreadable."""
+        conn = sqlite3.connect(self.db_path)
+        row = conn.execute('SELECT username, password, updated_at FROM vm_credential WHERE host = ?',
+                           (host,)).fetchone()
+        conn.close()
+        if row is None or time.time() - row[2] > self.ttl:
+            return None
+        try:
+            return row[0], self.fernet.decrypt(row[1].encode()).decode()
+        except InvalidToken:
+            logging.info(f"Cached credential for {host} can not be decrypted, ignoring it")
+            return None
+
+    def put(self, host, username, password):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('''
+            INSERT OR REPLACE INTO vm_credential (host, username, password, updated_at)
+            VALUES (?, ?, ?, ?)
+        ''', (host, username, self.fernet.encrypt(password.encode()).decode(), time.time()))
+        conn.commit()
+        conn.close()
+
+    def forget(self, host):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('DELETE FROM vm_credential WHERE host = ?', (host,))
+        conn.commit()
+        conn.close()
@@ -0,0 +1,64 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+DEFAULT_TTL = 900
+
+
+class DiscoveryCache:
+    """
+    Recent discovery results per box, reused by runs started within ttl seconds.
+
+    An entry keeps the discovery result (vCenter, session, folder, host and VM MoRefs)
+    together with the inventory table it was read from, so the follow-up run gets IPs
+    and power states without going back to vCenter. Runs that power off or reboot
+    anything invalidate their box, since that is exactly what the entry describes.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=64):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()   # box name -> {'discovery': ..., 'inventory': ..., 'stored_at': ...}
+        self.lock = threading.Lock()
+
+    def get(self, box_name):
+        """Returns the live entry for box_name, or None if there is none or it expired."""
+        with self.lock:
+            entry = self.entries.get(box_name)
+            if entry is None:
+                return None
+            if time.time() - entry['stored_at'] > self.ttl:
+                del self.entries[box_name]
+                return None
+            self.entries.move_to_end(box_name)
+            return entry
+
+    def put(self, box_name, discovery, inventory):
+        snapshot = dict(discovery, hosts=list(discovery['hosts']), vms=list(discovery['vms']))
+        with self.lock:
+            self.entries[box_name] = {'discovery': snapshot, 'inventory': inventory, 'stored_at': time.time()}
+            self.entries.move_to_end(box_name)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, box_name):
+        with self.lock:
+            self.entries.pop(box_name, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+_discovery_cache = None
+_discovery_cache_lock = threading.Lock()
+
+
+def get_discovery_cache():
+    """Process-wide cache shared by every HostManagement run."""
+    global _discovery_cache
+    with _discovery_cache_lock:
+        if _discovery_cache is None:
+            _discovery_cache = DiscoveryCache()
+        return _discovery_cache
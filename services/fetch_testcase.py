@@ -1,17 +1,25 @@
 import requests
 import os
 import json
+import threading
 from dotenv import load_dotenv
 from datetime import datetime
+from services.qtest_client import get_qtest_client
+from services.testcase_id_cache import get_testcase_id_cache
 
 
 
 load_dotenv()
 
+# Bulk updates fetch and PUT from several threads; keep the debug JSON dumps readable
+_payload_dump_lock = threading.Lock()
+
 class Testcase:
-    def __init__(self, auth_headers=None):
+    def __init__(self, auth_headers=None, client=None, id_cache=None):
         self.test_case_output = {}
         self.auth_headers = auth_headers or {}
+        self.client = client or get_qtest_client()
+        self.id_cache = id_cache or get_testcase_id_cache()
         
         # Fallback to environment variable if no headers provided
         if not self.auth_headers:
@@ -28,48 +36,75 @@ class Testcase:
     
 
     def fetch_all_testcase_fields(self,testcase_id):
-        response = requests.get(f"https://qtest.gtie.dell.com/api/v3/projects/442/test-cases/{testcase_id}", headers=self.headers)
+        response = self.client.get(f"test-cases/{testcase_id}", headers=self.headers)
         data = response.json()
+        if isinstance(data, dict) and 'id' in data and 'pid' in data:
+            self.id_cache.put(self.client.project_id, data['pid'], data['id'])
         return data
+
+    def prewarm_id_cache(self, query, page_size=100):
+        """
+        Caches the PID -> id mapping of every test case matching a qTest search query
+        (e.g. all test cases of a module or release). Returns how many were cached.
+        """
+        body = {"object_type": "test-cases", "fields": ["id", "pid"], "query": query}
+        cached = 0
+        page = 1
+        while True:
+            response = self.client.post("search", headers=self.headers, json=body,
+                                        params={"page": page, "pageSize": page_size})
+            response.raise_for_status()
+            items = response.json().get('items', [])
+            cached += self.id_cache.put_many(self.client.project_id,
+                                             [(item['pid'], item['id']) for item in items if 'pid' in item])
+            if len(items) < page_size:
+                return cached
+            page += 1
     
     def fetch_required_testcase_fields(self,testcase_id):
         
         data = self.fetch_all_testcase_fields(testcase_id)
+        self.test_case_output.update(self.required_fields(data))
+        return self.test_case_output,data['id']
+
+    def required_fields(self, data):
+        """Display fields of a test case payload as returned by fetch_all_testcase_fields."""
+        output = {}
         if 'web_url' in data:
-            self.test_case_output['test_case_web_url'] = data['web_url']
+            output['test_case_web_url'] = data['web_url']
         if 'pid' in data:
-            self.test_case_output['id'] = data['pid']
+            output['id'] = data['pid']
         if 'name' in data:
-            self.test_case_output['name'] = data['name']
+            output['name'] = data['name']
         for item in data['properties']:
             if item['field_name'] == "Assigned To":
-                self.test_case_output['assigned_to_value'] = item['field_value_name']
+                output['assigned_to_value'] = item['field_value_name']
             if item['field_name'] == "Automation Developer":
-                self.test_case_output['automation_developer'] = item['field_value_name']
+                output['automation_developer'] = item['field_value_name']
             if item['field_name'] == "Automation Status":
-                self.test_case_output['automation_status'] = item['field_value_name']
+                output['automation_status'] = item['field_value_name']
             if item['field_name'] == "Status":
-                self.test_case_output['test_case_status'] = item['field_value_name']
+                output['test_case_status'] = item['field_value_name']
             if item['field_name'] == "System Test Pillars":
-                self.test_case_output['pillar'] = item['field_value_name'].replace('[', '').replace(']', '')
+                output['pillar'] = item['field_value_name'].replace('[', '').replace(']', '')
             if item['field_name'] == "Automation Target Release Date":
                 # date_time_object = datetime.strptime(item['field_value'], "%Y-%m-%dT%H:%M:%S%z")
                 # date_part = date_time_object.strftime("%Y-%m-%d")
                 date_part = item['field_value'].split("T")[0]
-                self.test_case_output['automation_release_date'] = date_part
-
-        return self.test_case_output,data['id']
+                output['automation_release_date'] = date_part
+        return output
     
     def fetch_test_steps(self,testcase_id):
-        test_step_fetch_response = requests.get(f"https://qtest.gtie.dell.com/api/v3/projects/442/test-cases/{testcase_id}/test-steps", headers=self.headers)
+        test_step_fetch_response = self.client.get(f"test-cases/{testcase_id}/test-steps", headers=self.headers)
         test_step = test_step_fetch_response.json()
         # print(json.dumps(test_step, indent=4))
-        with open('services//api_test_steps.json', 'w') as f:
-            json.dump(test_step, f, indent=4)
+        with _payload_dump_lock:
+            with open('services//api_test_steps.json', 'w') as f:
+                json.dump(test_step, f, indent=4)
         return test_step
     
     def fetch_attachment(self,testcase_id):
-        attachment_response = requests.get(f"https://qtest.gtie.dell.com/api/v3/projects/442/test-cases/{testcase_id}/attachments", headers = self.headers)
+        attachment_response = self.client.get(f"test-cases/{testcase_id}/attachments", headers = self.headers)
         attachment = attachment_response.json()
         return attachment
     
@@ -81,7 +116,7 @@ class Testcase:
         # response = requests.delete(f"https://qtest.gtie.dell.com/api/v3/projects/442/test-cases/{pid}/blob-handles/{blobid}", headers=self.headers)
         #response = requests.delete(f"https://qtest.gtie.dell.com/api/v3/projects/442/test-cases/5038077/blob-handles/8972480", headers=self.headers)
         try:
-            response = requests.delete("https://qtest.gtie.dell.com/api/v3/projects/442/test-cases/5038077/blob-handles/8972480", headers=self.headers)
+            response = self.client.delete("test-cases/5038077/blob-handles/8972480", headers=self.headers)
             if response.status_code == 200:
                 print(f"JSON file generated successfully: api_all_fields.json")
             else:
@@ -0,0 +1,85 @@
+import json
+import os
+import threading
+
+
+SERVICES_DIR = os.path.dirname(os.path.abspath(__file__))
+FIELDS_PATH = os.path.join(SERVICES_DIR, 'api_all_fields.json')
+STATUS_PATH = os.path.join(SERVICES_DIR, 'required_automation_status.json')
+
+
+class FieldMetadataRegistry:
+    """
+    qTest field metadata (api_all_fields.json, required_automation_status.json) indexed for lookups.
+
+    Both files are parsed once into dicts keyed by field label and value label;
+    every lookup checks the files' mtimes and reloads only when one changed.
+    Lookups with field None search the labels of every field, in file order.
+    """
+
+    def __init__(self, fields_path=FIELDS_PATH, status_path=STATUS_PATH):
+        self.fields_path = fields_path
+        self.status_path = status_path
+        self.lock = threading.Lock()
+        self.mtimes = None
+        self.fields = {}     # field label -> value label -> [(value, is_active)]
+        self.any_field = {}  # value label -> [(value, is_active)] across all fields
+        self.statuses = {}   # status field name -> value label -> value
+
+    def _refresh(self):
+        mtimes = (os.path.getmtime(self.fields_path), os.path.getmtime(self.status_path))
+        with self.lock:
+            if mtimes == self.mtimes:
+                return
+            with open(self.fields_path, 'r') as f:
+                fields_data = json.load(f)
+            with open(self.status_path, 'r') as f:
+                status_data = json.load(f)
+
+            fields, any_field = {}, {}
+            for field in fields_data:
+                values = fields.setdefault(field['label'], {})
+                for value in field.get('allowed_values', []):
+                    entry = (value['value'], value.get('is_active', True))
+                    values.setdefault(value['label'], []).append(entry)
+                    any_field.setdefault(value['label'], []).append(entry)
+            statuses = {}
+            for field_name, items in status_data.items():
+                values = statuses.setdefault(field_name, {})
+                for item in items:
+                    values.setdefault(item['field_value_name'], item['field_value'])
+
+            self.fields, self.any_field, self.statuses = fields, any_field, statuses
+            self.mtimes = mtimes
+
+    def has_field(self, field):
+        self._refresh()
+        return field in self.fields
+
+    def values(self, field, label, active_only=False):
+        """Every value with this label in field (or in any field when field is None)."""
+        self._refresh()
+        index = self.any_field if field is None else self.fields.get(field, {})
+        return [value for value, is_active in index.get(label, []) if is_active or not active_only]
+
+    def value(self, field, label, active_only=False):
+        values = self.values(field, label, active_only)
+        return values[0] if values else None
+
+    def status_value(self, field_name, label):
+        """Value of a 'Status' / 'Automation Status' option from required_automation_status.json."""
+        self._refresh()
+        return self.statuses.get(field_name, {}).get(label)
+
+
+_field_metadata = None
+_field_metadata_lock = threading.Lock()
+
+
+def get_field_metadata():
+    """Process-wide registry, so the files are parsed once for every session."""
+    global _field_metadata
+    with _field_metadata_lock:
+        if _field_metadata is None:
+            _field_metadata = FieldMetadataRegistry()
+        return _field_metadata
@@ -1,6 +1,7 @@
 import os 
 import time
-from threading import Thread, Event
+import logging
+from threading import Thread, Event, Lock
 from queue import Queue
 
 
@@ -73,4 +74,47 @@ def get_log_stats(log_file_path):
             'lines': sum(1 for _ in open(log_file_path, 'r', encoding='utf-8'))
         }
     except Exception:
-        return None
\ No newline at end of file
+        return None
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+class RunLogFilter(logging.Filter):
+    """Keeps only records logged by the threads of one run (the run thread and its '<run_name>-*' workers)."""
+
+    def __init__(self, run_name):
+        super().__init__()
+        self.run_name = run_name
+
+    def filter(self, record):
+        return record.threadName == self.run_name or record.threadName.startswith(self.run_name + "-")
+
+
+_console_handler = None
+_console_lock = Lock()
+
+
+def start_run_log(run_name, log_path):
+    """
+    Attaches a file handler for one run to the root logger and returns it.
+    Concurrent runs each get their own file because every handler filters on thread name.
+    """
+    global _console_handler
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    with _console_lock:
+        if _console_handler is None:
+            _console_handler = logging.StreamHandler()
+            _console_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+            root.addHandler(_console_handler)
+
+    handler = logging.FileHandler(log_path)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    handler.addFilter(RunLogFilter(run_name))
+    root.addHandler(handler)
+    return handler
+
+
+def stop_run_log(handler):
+    logging.getLogger().removeHandler(handler)
+    handler.close()
@@ -8,20 +8,43 @@ import logging
 import time
 import paramiko
 import itertools
-from pyVim.connect import SmartConnect, Disconnect
 from pyVmomi import vim
-import ssl
-import subprocess
 import tempfile
-import atexit
 import threading
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from services.vcenter_inventory import VcenterInventory
+from services.box_location_index import BoxLocationIndex, BoxLocationWatcher, get_watcher, set_watcher
+from services.discovery_cache import get_discovery_cache
+from services.run_checkpoints import CheckpointStore
+from services.vcenter_session_pool import get_session_pool
+from services.vcenter_tasks import TaskWaiter, task_error_message
+from services.host_reboot import RollingHostReboot
+from services.vm_readiness import VmReadinessProber
+from services.credential_cache import CredentialCache
+from services.ssh_pool import SshConnectionPool
+from services.handling_log import start_run_log, stop_run_log
+from services.run_tracer import RunTracer
+from services.axcli_watcher import AxcliStateWatcher, PHASE_TIMEOUTS as AXCLI_PHASE_TIMEOUTS
 
 
 load_dotenv()
 
+# Discovery diagnostics; set HOST_MANAGEMENT_DEBUG=1 to have them written to the run logs.
+# The level goes on the shared 'services' logger so box_location_index's diagnostics show up too.
+logger = logging.getLogger(__name__)
+if os.getenv('HOST_MANAGEMENT_DEBUG'):
+    logging.getLogger('services').setLevel(logging.DEBUG)
+
+
+VM_USERNAME = "root"
+VM_PASSWORDS = ['dangerous', 'D@ngerous', 'D@nger0us1']
+
 
 class HostManagement:
-    def __init__(self):
+    def __init__(self, parallel_discovery=True, box_index=None, session_pool=None, power_concurrency=10,
+                 credential_cache=None, ssh_timeout=10, ready_concurrency=8, ready_timeout=3600, ssh_port=22,
+                 discovery_cache=None, checkpoint_store=None):
         self.all_data_centers = [
             {
                 "vcenter_server" : f"{os.getenv('vcenter_est_hop_server')}",
@@ -38,501 +61,830 @@ class HostManagement:
             }]
         self.si = None
         self.content = None
+        self.inventory = None
+        self.inventories = {}
+        self.shared_inventories = None   # SharedInventories of a batch; set by BoxScheduler
+        self.host_index = {}
+        self.parallel_discovery = parallel_discovery
+        self.box_index = box_index or BoxLocationIndex()
+        self.discovery_cache = discovery_cache or get_discovery_cache()
+        self.checkpoints = checkpoint_store or CheckpointStore()
+        self.checkpoint_box = None
+        self.checkpoint_flow = None
+        self.completed_stages = {}
+        self.session_pool = session_pool or get_session_pool()
+        self.power_concurrency = power_concurrency
+        self.power_task_timeout = 600   # seconds a single power on/off task may take
+        self.credential_cache = credential_cache or CredentialCache()
+        self.ssh_port = ssh_port
+        self.ssh_pool = SshConnectionPool(timeout=ssh_timeout, port=ssh_port)
+        self.ready_concurrency = ready_concurrency
+        self.ready_timeout = ready_timeout
+        self.axcli_timeouts = dict(AXCLI_PHASE_TIMEOUTS)
+        self.adios_settle_time = 20
+        self.ready_cancel_grace = 60   # seconds cancelled ready_host workers get to stop
+        self.run_report = {}
+        self.run_name = "host-management"
+        self.tracer = RunTracer()
+        self.progress = None
 
 
     def connect_vcenter (self, vcenter , username, password ):
-        context = ssl._create_unverified_context()
-        si = SmartConnect(host=vcenter, user=username, pwd=password, sslContext=context)
-        atexit.register(Disconnect, si)
-        return si
+        # Sessions are pooled and reused across runs; the pool logs them out on eviction and exit
+        return self.session_pool.get(vcenter, username, password)
 
-    def get_container_view(self, content, container):
+    def get_inventory(self, content, cancel_event=None):
 
-        vimTypes = [ vim.Folder, vim.VirtualMachine, vim.ComputeResource, vim.HostSystem ]
-        view = content.viewManager.CreateContainerView(container, vimTypes, True)
-        objs = list(view.view)
-        view.Destroy()
-        return objs
+        # One table per vCenter content; discovery threads each build their own
+        inventory = self.inventories.get(id(content))
+        if inventory is None:
+            if self.shared_inventories is not None:
+                # Other boxes of the batch may be waiting on the same load, so it is not cancelled
+                inventory = self.shared_inventories.get(content)
+            else:
+                inventory = VcenterInventory(content).load(cancel_event=cancel_event)
+            if cancel_event is None or not cancel_event.is_set():
+                self.inventories[id(content)] = inventory
+        return inventory
 
     def find_folder_by_name(self, content, system_name):
 
-        container = self.get_container_view(content, content.rootFolder)
-        for item in container:
-            if system_name in item.name and isinstance(item, vim.Folder):
-                # Check if this is a datastore folder (which we don't want)
-                if hasattr(item, 'parent') and item.parent:
-                    parent_name = getattr(item.parent, 'name', '').lower()
-                    if 'datastore' in parent_name or 'storage' in parent_name:
-                        logging.info(f"DEBUG: Skipping datastore folder: {item.name} (parent: {parent_name})")
-                        continue
-                
-                logging.info(f"DEBUG: Found valid folder: {item.name} (parent: {getattr(item.parent, 'name', 'Root') if hasattr(item, 'parent') and item.parent else 'Root'})")
-                return item
-        
-        logging.info(f"DEBUG: No valid folder found for system name: {system_name}")
+        inventory = self.get_inventory(content)
+        for row in inventory.folders_matching(system_name):
+            # Check if this is a datastore folder (which we don't want)
+            parent_name = inventory.name(row.get('parent'), '').lower()
+            if 'datastore' in parent_name or 'storage' in parent_name:
+                logger.debug("Skipping datastore folder: %s (parent: %s)", row['name'], parent_name)
+                continue
+
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Found valid folder: %s (parent: %s)", row['name'], inventory.name(row.get('parent'), 'Root'))
+            return row['obj']
+
+        logger.debug("No valid folder found for system name: %s", system_name)
         return None
 
     def get_hosts_and_vms_from_folder(self, content, folder):
 
-        hosts = set()
-        vms = set()
+        inventory = self.get_inventory(content)
+        hosts, vms = inventory.hosts_and_vms(folder)
+
+        # Per-object lines are only built when someone is reading them
+        if logger.isEnabledFor(logging.DEBUG):
+            folder_row = inventory.get(folder) or {}
+            logger.debug("Searching for hosts and VMs in folder: %s", folder_row.get('name'))
+            logger.debug("Folder path: %s", inventory.name(folder_row.get('parent'), 'Root'))
+            logger.debug("Direct children in folder: %d", len(inventory.children(folder)))
+            for host in hosts:
+                logger.debug("Found %s: %s", inventory.get(host)['type'], inventory.name(host))
+            for vm in vms:
+                logger.debug("Adding VM: %s", inventory.name(vm))
+        logger.debug("Total hosts found: %d", len(hosts))
+        logger.debug("Total VMs found: %d", len(vms))
 
-        logging.info(f"DEBUG: Searching for hosts and VMs in folder: {folder.name}")
-        logging.info(f"DEBUG: Folder path: {folder.parent.name if hasattr(folder, 'parent') and folder.parent else 'Root'}")
-        
-        # First, let's check what's directly in this folder
-        try:
-            direct_children = folder.childEntity if hasattr(folder, 'childEntity') else []
-            logging.info(f"DEBUG: Direct children in folder: {len(direct_children)}")
-            for child in direct_children:
-                logging.info(f"DEBUG: Direct child - Type: {type(child).__name__}, Name: {getattr(child, 'name', 'N/A')}")
-        except Exception as e:
-            logging.info(f"DEBUG: Error accessing direct children: {e}")
-        
-        # Now try the container view
-        entity = self.get_container_view(content, folder)
-        logging.info(f"DEBUG: Found {len(entity)} entities in container view")
-        
-        for child in entity:
-            logging.info(f"DEBUG: Processing entity type: {type(child).__name__}, name: {getattr(child, 'name', 'N/A')}")
-
-            if isinstance(child, vim.ComputeResource):
-                logging.info(f"DEBUG: Found ComputeResource: {child.name}")
-                hosts.add(child)
-                
-                # Get VMs from this compute resource
-                if hasattr(child, 'resourcePool') and child.resourcePool:
-                    if hasattr(child.resourcePool, 'vm') and child.resourcePool.vm:
-                        logging.info(f"DEBUG: Found {len(child.resourcePool.vm)} VMs in resource pool")
-                        for vm in child.resourcePool.vm:
-                            logging.info(f"DEBUG: Adding VM: {vm.name}")
-                            vms.add(vm)
-                    else:
-                        logging.info(f"DEBUG: No VMs found in resource pool for {child.name}")
-                else:
-                    logging.info(f"DEBUG: No resource pool found for {child.name}")
-                    
-            elif isinstance(child, vim.HostSystem):
-                logging.info(f"DEBUG: Found HostSystem directly: {child.name}")
-                hosts.add(child)
-                
-                # Try to get VMs from this host
-                if hasattr(child, 'vm') and child.vm:
-                    logging.info(f"DEBUG: Found {len(child.vm)} VMs directly on host")
-                    for vm in child.vm:
-                        logging.info(f"DEBUG: Adding VM from host: {vm.name}")
-                        vms.add(vm)
-                        
-            elif isinstance(child, vim.VirtualMachine):
-                logging.info(f"DEBUG: Found VirtualMachine directly: {child.name}")
-                vms.add(child)
-            
-            elif isinstance(child, vim.Folder):
-                logging.info(f"DEBUG: Found subfolder: {child.name}")
-                # Recursively search subfolders
-                sub_hosts, sub_vms = self.get_hosts_and_vms_from_folder(content, child)
-                hosts.update(sub_hosts)
-                vms.update(sub_vms)
-
-        logging.info(f"DEBUG: Total hosts found: {len(hosts)}")
-        logging.info(f"DEBUG: Total VMs found: {len(vms)}")
-        
         return hosts, vms
-    
+
     def find_vms_with_system_name(self, content, system_name):
 
-        hosts = set()
-        vms = set()
         all_details = {}
 
-        vm_detected = 0
-        entity = self.get_container_view(content, content.rootFolder)
-        for item in entity:
-            
-            if isinstance(item, vim.Folder):
-                continue
+        hosts, vms = self.get_inventory(content).compute_resources_with_vm_name(system_name)
 
-            if isinstance(item, vim.ComputeResource):       
-                for vm in item.resourcePool.vm:
-                    if system_name in vm.name:
-        
-                        hosts.add(item)
-        
-        for host in hosts:  
-            for vm in host.resourcePool.vm:
-                vms.add(vm)
-                    
-        
         all_details['hosts'] = hosts
         all_details['vms'] = vms
         return all_details
-    
+
+    def search_vcenter(self, vcenter, boxname, cancel_event=None):
+
+        si = self.connect_vcenter( vcenter['vcenter_server'], vcenter['username'], vcenter['password'])
+        content = si.RetrieveContent()
+        self.get_inventory(content, cancel_event)
+        if cancel_event is not None and cancel_event.is_set():
+            return None
+
+        result = {'vcenter': vcenter['vcenter_server'], 'si': si, 'content': content, 'folder': None}
+        folder = self.find_folder_by_name(content, boxname)
+
+        if folder:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Found folder '%s' in vCenter: %s", self.get_inventory(content).name(folder), vcenter['vcenter_server'])
+            logging.info("Details found in vCenter : " + vcenter['vcenter_server'])
+            result['folder'] = folder
+            result['hosts'], result['vms'] = self.get_hosts_and_vms_from_folder(content, folder)
+            return result
+
+        logger.debug("Folder '%s' not found in vCenter: %s", boxname, vcenter['vcenter_server'])
+        all_details = self.find_vms_with_system_name(content, boxname)
+        if all_details['hosts'] and all_details['vms']:
+            logging.info("Details found in vCenter : " + vcenter['vcenter_server'])
+            result['hosts'], result['vms'] = all_details['hosts'], all_details['vms']
+            return result
+
+        logging.info("Details Not found in vCenter : " + vcenter['vcenter_server'])
+        return None
+
+    def lookup_box_index(self, boxname):
+        """
+        Resolves a box from the location index without scanning any vCenter.
+
+        Returns None when the box was never indexed or its cached MoRefs are stale,
+        in which case the caller falls back to a full scan.
+        """
+
+        entry = self.box_index.lookup(boxname)
+        if entry is None:
+            return None
+
+        watcher = get_watcher(boxname)
+        if watcher is not None and watcher.vcenter_server != entry['vcenter_server']:
+            watcher = None
+        fresh = False
+        for attempt in range(2):
+            try:
+                if watcher is None:
+                    vcenter = next((vc for vc in self.all_data_centers if vc['vcenter_server'] == entry['vcenter_server']), None)
+                    if vcenter is None:
+                        break
+                    si = self.connect_vcenter( vcenter['vcenter_server'], vcenter['username'], vcenter['password'])
+                    watcher = BoxLocationWatcher(si, si.RetrieveContent(), entry)
+                # The watcher outlives runs; only this run's refresh counts toward its property fetches
+                watcher.inventory.reset_stats()
+                fresh = watcher.refresh()
+                break
+            except Exception as e:
+                # Typically an expired session behind a watcher from an earlier run
+                logger.debug("Cached location for %s could not be refreshed: %s", boxname, e)
+                set_watcher(boxname, None)
+                watcher = None
+
+        if fresh:
+            hosts, vms = watcher.hosts_and_vms()
+            fresh = bool(hosts) and bool(vms)
+        if not fresh:
+            logger.debug("Cached location for %s is stale, scanning vCenters", boxname)
+            set_watcher(boxname, None)
+            self.box_index.forget(boxname)
+            return None
+
+        set_watcher(boxname, watcher)
+        self.box_index.record(boxname, watcher.vcenter_server, watcher.folder, hosts, vms)
+        self.inventories[id(watcher.content)] = watcher.inventory
+        logging.info("Details found in vCenter : " + watcher.vcenter_server + " (location index)")
+        return {'vcenter': watcher.vcenter_server, 'si': watcher.si, 'content': watcher.content,
+                'folder': watcher.folder, 'hosts': hosts, 'vms': vms}
+
+    def cached_discovery(self, boxname):
+        """
+        Discovery result of a recent run on the same box, if it is still usable.
+
+        The entry is only used while the pool hands back the very session it was
+        discovered with, since its MoRefs are bound to that session.
+        """
+
+        entry = self.discovery_cache.get(boxname)
+        if entry is None:
+            return None
+
+        discovery = entry['discovery']
+        vcenter = next((vc for vc in self.all_data_centers if vc['vcenter_server'] == discovery['vcenter']), None)
+        si = self.connect_vcenter( vcenter['vcenter_server'], vcenter['username'], vcenter['password']) if vcenter else None
+        if si is not discovery['si']:
+            self.discovery_cache.invalidate(boxname)
+            return None
+
+        # The inventory outlives runs; only this run's fetches count toward its property fetches
+        entry['inventory'].reset_stats()
+        self.inventories[id(discovery['content'])] = entry['inventory']
+        logging.info("Details found in vCenter : " + discovery['vcenter']
+                     + f" (cached {int(time.time() - entry['stored_at'])} s ago)")
+        return dict(discovery)
+
+    def discover_box(self, boxname):
+
+        result = self.lookup_box_index(boxname)
+        if result is None:
+            result = self.scan_vcenters(boxname)
+            if result:
+                self.box_index.record(boxname, result['vcenter'], result['folder'], result['hosts'], result['vms'])
+        return result
+
+    def scan_vcenters(self, boxname):
+        """
+        Finds the vCenter owning a box.
+
+        A folder match is authoritative and wins immediately; a match on VM names only
+        is used when no vCenter has a folder for the box, preferring the configured order.
+        With parallel_discovery all vCenters are searched at once and the remaining
+        searches are cancelled as soon as an authoritative match comes back.
+        """
+
+        fallback = {}
+
+        if not self.parallel_discovery:
+            for index, vcenter in enumerate(self.all_data_centers):
+                result = self.search_vcenter(vcenter, boxname)
+                if result and result['folder'] is not None:
+                    return result
+                if result:
+                    fallback[index] = result
+            return fallback[min(fallback)] if fallback else None
+
+        cancel_event = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=len(self.all_data_centers), thread_name_prefix=f"{self.run_name}-discovery")
+        futures = {
+            executor.submit(self.search_vcenter, vcenter, boxname, cancel_event): index
+            for index, vcenter in enumerate(self.all_data_centers)
+        }
+        try:
+            for future in as_completed(futures):
+                vcenter = self.all_data_centers[futures[future]]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logging.error(f"Discovery failed in vCenter {vcenter['vcenter_server']} : {e}")
+                    continue
+                if result and result['folder'] is not None:
+                    cancel_event.set()
+                    return result
+                if result:
+                    fallback[futures[future]] = result
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        return fallback[min(fallback)] if fallback else None
+
     def get_vm_ip(self, vms):
 
         single_vm = {}
         vm_details = []
 
-        # entity = self.get_container_view(content, content.rootFolder)
         logging.info(" Fetching the VM IPs ....")
         for vm in vms:
             single_vm = {
                         "vm" : vm,
-                        "vm_ip" : vm.guest.ipAddress
+                        "vm_ip" : self.inventory.value(vm, 'guest.ipAddress')
                     }
-            vm_details.append(single_vm)                
-        
+            vm_details.append(single_vm)
+
         return vm_details
 
-    def get_vm_credentials(self, vm_detials):
+    def set_power_state(self, vms, power_on, max_concurrency=None):
+        """
+        Powers a set of VMs on or off with up to max_concurrency tasks in flight.
 
-        logging.info(" Fetching the credentials for the VMs .....")
-        
-        vm_details_with_login = []
-        username = "root"
-        passwords = ['dangerous', 'D@ngerous', 'D@nger0us1']
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-
-        for item in vm_detials:
-            hostname = item['vm_ip']
-            
-            for password in passwords:
-                ssh = paramiko.SSHClient()  # Create a new SSHClient object
-                ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        Returns one report entry per VM with its result ('success', 'error',
+        'skipped' or 'timeout') and how long its task took. A task still running
+        power_task_timeout seconds after it started is reported as 'timeout' and
+        no longer waited on.
+        """
 
-                try:
-                    ssh.connect(hostname, username=username, password=password)
-                    item['username'] = username
-                    item['password'] = password
-                    vm_details_with_login.append(item)
-                    logging.info(f"Credentials found for {item['vm_name']} : {username} : {password}")
-                    break
-                except paramiko.ssh_exception.AuthenticationException:
-                    continue
-                finally:
-                    ssh.close()  # Close the SSHClient object
+        target = vim.VirtualMachinePowerState.poweredOn if power_on else vim.VirtualMachinePowerState.poweredOff
+        action = "power_on" if power_on else "power_off"
+        max_concurrency = max_concurrency or self.power_concurrency
+        report = []
 
-        return vm_details_with_login        
-            
-    def power_off_vms( self, vms ):
-    
+        # Current power state of every VM in one round trip
+        self.inventory.load_objects(vms)
+        queue = []
         for vm in vms:
-            
-            # Skip if already off
-            if vm.runtime.powerState == vim.VirtualMachinePowerState.poweredOff:
-                logging.info(f"{vm.name} is already powered off.")
-            else:    
-                logging.info(f" Powering off {vm.name} (hard)...")
-                task = vm.PowerOffVM_Task()
-                while task.info.state in [vim.TaskInfo.State.running, vim.TaskInfo.State.queued]:
-                    time.sleep(15)
-                if task.info.state == "success":
-                    logging.info(f"{vm.name} powered off.")
-                else:
-                    logging.error(task.info.error)
-         
-    def enter_maintainence_mode( self, content, hosts ):
-        
-        container = content.viewManager.CreateContainerView(content.rootFolder, [vim.HostSystem], True)
-
-        for host in hosts: 
-            for child in container.view:
-                if host.name in child.name:
-                    if not child.runtime.inMaintenanceMode:
-                        task = child.EnterMaintenanceMode_Task(timeout=300, evacuatePoweredOffVms=False)
-                        while task.info.state not in [vim.TaskInfo.State.success, vim.TaskInfo.State.error]:
-                            logging.info( "Waiting.....", task.info.progress )
-                            time.sleep(5)
-                        if task.info.state == vim.TaskInfo.State.success:
-                            logging.info(f"Host {host.name} in maintenance mode")
-                        else:
-                            logging.error(f"Failed to enter maintenance mode on host: {task.info.error}")
-                    else:
-                        logging.info(f"The host {host.name} is already in maintenance mode")
-
-        container.Destroy()
+            name = self.inventory.name(vm)
+            if self.inventory.value(vm, 'runtime.powerState') == target:
+                logging.info(f"{name} is already powered {'on' if power_on else 'off'}.")
+                report.append({'vm': name, 'action': action, 'result': 'skipped', 'error': None, 'duration': 0.0})
+            else:
+                queue.append(vm)
 
-    def reboot_host(self, content, hosts):
-        """
-        Reboots an ESX host and waits for it to get connected again.
-        
-        Parameters:
-        host_name (str): The name of the ESX host to reboot.
-        vsphere_client: The vSphere client object.
-        
-        Returns:
-        None
-        """
+        waiter = TaskWaiter(self.content)
+        started = {}
+        try:
+            while queue or waiter.pending:
+                while queue and len(waiter.pending) < max_concurrency:
+                    vm = queue.pop(0)
+                    name = self.inventory.name(vm)
+                    logging.info(f" Powering {'on' if power_on else 'off (hard)'} {name}...")
+                    try:
+                        task = vm.PowerOnVM_Task() if power_on else vm.PowerOffVM_Task()
+                    except Exception as e:
+                        logging.error(f"Failed to power {'on' if power_on else 'off'} {name}: {e}")
+                        report.append({'vm': name, 'action': action, 'result': 'error', 'error': str(e), 'duration': 0.0})
+                        continue
+                    started[task._moId] = (vm, time.time(), task)
+                    waiter.add(task)
 
-        container = content.viewManager.CreateContainerView(content.rootFolder, [vim.HostSystem], True)
-
-        for host in hosts: 
-            for child in container.view:
-                if host.name in child.name:
-                    
-                    logging.info(f"Initiating reboot for host: {host.name}")
-                    task = child.RebootHost_Task(force=True)
-                    
-                    disconnect_deadline = time.time() + 1800
-                    while time.time() < disconnect_deadline:                       
-                        cs = child.summary.runtime.connectionState
-                        ps = child.summary.runtime.powerState
-                        logging.info(f"[WaitUp] connectionState={cs}, powerState={ps}")
-                        if str(cs).lower() == "notresponding":
-                            break
-                        time.sleep(120)
-                    
-                    reconnect_deadline = time.time() + 1800
-                    while time.time() < reconnect_deadline:
-                        try:
-                            cs = child.summary.runtime.connectionState
-                            ps = child.summary.runtime.powerState
-                            logging.info(f"[WaitUp] connectionState={cs}, powerState={ps}")
-                            if str(cs).lower() == "connected":
-                                logging.info(f"Host {host.name} is connected")
-                                break
-                        except Exception as e:
-                            logging.error("Exception occured: " + str(e))
-                        time.sleep(120)
-                    
-        container.Destroy()
-
-    def exit_maintainence_mode( self, content, hosts ):
-        
-        container = content.viewManager.CreateContainerView(content.rootFolder, [vim.HostSystem], True)
-
-        for host in hosts: 
-            for child in container.view:
-                if host.name in child.name:
-                    if child.runtime.inMaintenanceMode:
-                        task = child.ExitMaintenanceMode_Task(timeout=300)
-                        while task.info.state not in [vim.TaskInfo.State.success, vim.TaskInfo.State.error]:
-                            logging.info( "Waiting.....", task.info.progress )
-                            time.sleep(5)
-                        if task.info.state == vim.TaskInfo.State.success:
-                            logging.info(f"Host {host.name} is Not in maintenance mode")
-                        else:
-                            logging.error(f"Failed to exit maintenance mode on host: {task.info.error}")
+                if not waiter.pending:
+                    continue
+                next_deadline = min(start_time for _, start_time, _ in started.values()) + self.power_task_timeout
+                for result in waiter.wait_any(max(0, next_deadline - time.time())):
+                    vm, start_time, _ = started.pop(result['task']._moId)
+                    name = self.inventory.name(vm)
+                    entry = {'vm': name, 'action': action, 'result': result['state'], 'error': None,
+                             'duration': round(time.time() - start_time, 1)}
+                    if result['state'] == vim.TaskInfo.State.success:
+                        logging.info(f"{name} powered {'on' if power_on else 'off'}.")
                     else:
-                        logging.info(f"The host {host.name} is already iNot in maintenance mode")
+                        entry['error'] = task_error_message(result['error'])
+                        logging.error(f"{name} : {entry['error']}")
+                    report.append(entry)
+                    self.tracer.record(f"{action}.vm", start_time, time.time(), vm=name,
+                                       status='ok' if entry['error'] is None else 'error', error=entry['error'])
+
+                for moid, (vm, start_time, task) in list(started.items()):
+                    if time.time() - start_time < self.power_task_timeout:
+                        continue
+                    del started[moid]
+                    waiter.discard(task)
+                    name = self.inventory.name(vm)
+                    error = f"Task still running after {self.power_task_timeout} seconds"
+                    logging.error(f"{name} : {error}")
+                    report.append({'vm': name, 'action': action, 'result': 'timeout', 'error': error,
+                                   'duration': round(time.time() - start_time, 1)})
+                    self.tracer.record(f"{action}.vm", start_time, time.time(), vm=name, status='timeout', error=error)
+        finally:
+            waiter.close()
+
+        return report
 
-        container.Destroy()
+    def power_off_vms( self, vms ):
+
+        self.report_progress("Powering off VMs")
+        with self.tracer.span("power_off", vms=len(vms)):
+            report = self.set_power_state(vms, power_on=False)
+        self.run_report.setdefault('power', []).extend(report)
+        return report
 
     def power_on_vms( self, vms ):
 
-        for vm in vms:
-         
-            if vm.runtime.powerState == vim.VirtualMachinePowerState.poweredOn:
-                    logging.info(f" {vm.name} is already powered on.")
-            else:
-                logging.info(f" Powering on {vm.name}...")
-                task = vm.PowerOnVM_Task()
-                while task.info.state in [vim.TaskInfo.State.running, vim.TaskInfo.State.queued]:
-                    time.sleep(15)
-                if task.info.state == "success":
-                    logging.info(f"{vm.name} powered on.")
+        self.report_progress("Powering on VMs")
+        with self.tracer.span("power_on", vms=len(vms)):
+            report = self.set_power_state(vms, power_on=True)
+        self.run_report.setdefault('power', []).extend(report)
+        return report
+
+    def resolve_host_systems(self, content, hosts):
+        """Maps discovered hosts (compute resources or host systems) to (name, HostSystem) by MoRef."""
+
+        inventory = self.get_inventory(content)
+        resolved = []
+        for moid, host_system in inventory.host_systems(hosts).items():
+            if moid not in self.host_index:
+                self.host_index[moid] = (inventory.name(host_system), host_system)
+            resolved.append(self.host_index[moid])
+        return resolved
+
+    def reboot_hosts_rolling(self, content, hosts, batch_size=1):
+
+        self.report_progress("Rebooting ESX hosts")
+        host_systems = self.resolve_host_systems(content, hosts)
+        logging.info(f"Rebooting {len(host_systems)} ESX hosts, {batch_size} at a time")
+        with self.tracer.span("esx_reboot", hosts=len(host_systems), batch_size=batch_size):
+            completed_steps = {}
+            for stage, subject in self.completed_stages:
+                if stage.startswith("esx_reboot."):
+                    completed_steps.setdefault(subject, set()).add(stage.split(".", 1)[1])
+            report = RollingHostReboot(content, batch_size, thread_name_prefix=f"{self.run_name}-esx-reboot",
+                                       tracer=self.tracer, completed_steps=completed_steps,
+                                       on_step_done=lambda name, step: self.mark_stage(f"esx_reboot.{step}", name)
+                                       ).run(host_systems)
+        self.run_report['esx_reboot'] = report
+        return report
+
+    def wait_for_vm_console_ready(self, vm_details, timeout=4000):
+
+        self.report_progress("Waiting for VM consoles")
+        prober = VmReadinessProber(self.inventory, port=self.ssh_port, timeout=timeout, thread_name_prefix=f"{self.run_name}-vm-readiness")
+        with self.tracer.span("console_wait", vms=len(vm_details)):
+            start_time = time.time()
+            report = prober.wait(vm_details)
+            for entry in report:
+                self.tracer.record("console_wait.vm", start_time, start_time + entry['duration'], vm=entry['vm'],
+                                   status='ok' if entry['state'] == 'ready' else entry['state'])
+        self.run_report['console_ready'] = report
+        return report
+
+    def try_vm_login(self, host_ip, username, password):
+        """Returns True if the login works, False on bad credentials; raises when the host is unreachable."""
+
+        try:
+            # A successful login stays open in the pool for the ACLX and ADIOS steps
+            self.ssh_pool.get(host_ip, username, password)
+            return True
+        except paramiko.ssh_exception.AuthenticationException:
+            return False
+
+    def find_vm_credentials(self, item):
+
+        host_ip = item['vm_ip']
+        host_name = self.inventory.name(item['vm'], item['vm']._moId)
+        new_entry = {'hostname': host_name, 'hostip': host_ip, 'username': None, 'password': None}
+        if host_ip is None:
+            return new_entry
+
+        # The password that worked last time goes first
+        candidates = [(VM_USERNAME, password) for password in VM_PASSWORDS]
+        cached = self.credential_cache.get(host_name)
+        if cached is not None:
+            candidates = [cached] + [candidate for candidate in candidates if candidate != cached]
+
+        for username, password in candidates:
+            try:
+                if not self.try_vm_login(host_ip, username, password):
+                    if (username, password) == cached:
+                        self.credential_cache.forget(host_name)
+                    continue
+            except Exception as e:
+                logging.error(f"Unable to reach {host_name} ({host_ip}) over SSH: {e}")
+                break
+            new_entry['username'] = username
+            new_entry['password'] = password
+            self.credential_cache.put(host_name, username, password)
+            logging.info(f"Credentials found for {host_name} : {username} : {password}")
+            break
+        return new_entry
+
+    def get_vm_credentials(self, vm_details, max_workers=16):
+
+        self.report_progress("Fetching VM credentials")
+        if not vm_details:
+            return []
+        def find(item, parent):
+            with self.tracer.span("credentials.vm", parent=parent, vm=self.inventory.name(item['vm'], item['vm']._moId)) as span:
+                entry = self.find_vm_credentials(item)
+                span['found'] = entry['username'] is not None
+                return entry
+
+        with self.tracer.span("credentials", vms=len(vm_details)) as span:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(vm_details)), thread_name_prefix=f"{self.run_name}-vm-credentials") as executor:
+                found = list(executor.map(find, vm_details, itertools.repeat(self.tracer.current_span())))
+        # VMs with an IP but no working login are left out, VMs without an IP are kept as placeholders
+        return [entry for entry in found if entry['hostip'] is None or entry['username'] is not None]
+
+    def set_up_aclx(self, vm_details_with_login, hostname, script_name):
+
+        with self.tracer.span("aclx", host=hostname.lower(), script=script_name):
+
+            hostname = hostname.lower()
+            hostip = username = password = None
+            exit_status = 0
+            for item in vm_details_with_login:
+                if hostname in item['hostname']:
+                    hostip = item['hostip']
+                    username = item['username']
+                    password = item['password']
+                    break
+            try:
+                client = self.ssh_pool.get(hostip, username, password)
+
+                logging.info("Starting the aclx restore script.....")
+                stdin,stdout,stderr = client.exec_command(f"chmod 777 {script_name}")
+                logging.info("Permissions changed")
+                exit_status = stdout.channel.recv_exit_status()
+                time.sleep(10)
+                if script_name.endswith('.py'):
+                    _stdin,_stdout,_stderr = client.exec_command(f"python3 {script_name}")
+                    logging.info("Python aclx db script initiated")
+                    output = _stdout.read().decode()
+                    error = _stderr.read().decode()
+                    exit_status = _stdout.channel.recv_exit_status()
                 else:
-                    logging.error(task.info.error)
-        
-    def wait_for_vm_console_ready(self, vm_details):
-        
-        logging.info("Waiting for the consoles to come up....")
-        for item in vm_details:
-           
-            host_obj = item['vm']
-            host_name = host_obj.name
-            ping_count_param = "-n" if os.name == "nt" else "-c"
-
-            end_time = time.time() + 4000
-            
-            if item['vm_ip'] is not None:
-                while time.time() < end_time:
-                    try:
-                        result = subprocess.run(["ping", ping_count_param, "1", item['vm_ip']], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-                        if result.returncode == 0:
-                            logging.info(f"VM {host_name} is ready")
-                            break
-                    except:
-                        logging.info(f"VM {host_name} is Not Yet ready")            
-                    time.sleep(60)
+                    _stdin,_stdout,_stderr = client.exec_command(f"{script_name}")
+                    logging.info("Shell aclx db script initiated")
+                    output = _stdout.read().decode()
+                    error = _stderr.read().decode()
+                    exit_status = _stdout.channel.recv_exit_status()                    
+                if exit_status == 0:
+                    logging.info(f"Aclx DB file restore is successful for host {hostname}")
+            except Exception as e:
+                logging.error(f"Error Occurred during aclx db restore : {e}")
+                exit_status = None
+
+        self.run_report['aclx'] = exit_status == 0
+        return exit_status == 0
+
+    def wait_or_cancel(self, cancel_event, seconds, hostname):
+
+        if cancel_event is None:
+            time.sleep(seconds)
+        elif cancel_event.wait(seconds):
+            raise TimeoutError(f"Readying {hostname} was cancelled")
+
+    def execute_command(self, hostname,  host, username, password, release, updateadios, cancel_event=None):
+
+        # Every command below runs on its own channel of the pooled connection
+        ssh = self.ssh_pool.get(host, username, password)
+        timeouts = self.axcli_timeouts
+
+        # One remote loop reports every dispatcher state change for the rest of this host's run
+        watcher = AxcliStateWatcher(ssh, hostname).start()
+        try:
+            output = watcher.wait_for(lambda state: True, timeouts['initial'], "an initial state", cancel_event)
+
+            # Check if output contains "Running"
+            if "Running" in output:
+                with self.tracer.span("adios.stop", host=hostname):
+                    # Issue "kill -9" command
+                    stdin, stdout, stderr = ssh.exec_command("kill -9")
+                    output = watcher.wait_for(lambda state: "Running" not in state, timeouts['stopped'], "a stopped state", cancel_event)
+
+            if "DNR" not in output:
+                with self.tracer.span("adios.dnr", host=hostname):
+                    stdin, stdout, stderr = ssh.exec_command("axcli dexit -all")
+                    output = stdout.read().decode()
+                    watcher.wait_for(lambda state: "DNR" in state, timeouts['dnr'], "DNR", cancel_event)
+                logging.info(f"Dispatcher set to Not Ready for {hostname}")
+
+            self.wait_or_cancel(cancel_event, self.adios_settle_time, hostname)
+            if updateadios == 1:
+
+                logging.info(f"Updating {release} Adios Version for {hostname}")
+                with self.tracer.span("adios.install", host=hostname, release=release):
+                    stdin, stdout, stderr = ssh.exec_command(f"/usr/adios/axinstall -b {release}")
+                    exit_status = stdout.channel.recv_exit_status()
+                if exit_status == 0:
+                    logging.info(f"Adios has been Updated for host {hostname}")
+                else:
+                    logging.info("Error Occurred : {}".format(exit_status))
+
+            logging.info(f"Configuring Dispatcher for host {hostname}")
+            with self.tracer.span("adios.config", host=hostname):
+                stdin, stdout, stderr = ssh.exec_command("axcli adiosx config")
+                exit_status = stdout.channel.recv_exit_status()
+            if exit_status == 0:
+                logging.info(f"Dispatcher configured for host {hostname}")
             else:
-                logging.info(f" Ip not available for host {host_name}")
-          
-    def get_vm_credentials(self, vm_details):
+                logging.info("Error Occurred : {}".format(exit_status))
 
-        logging.info(" Fetching the credentials for the VMs .....")
-        
-        vm_details_with_login = []
-        username = "root"
-        passwords = ['dangerous', 'D@ngerous', 'D@nger0us1']
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            with self.tracer.span("adios.ready", host=hostname):
+                watcher.wait_for(lambda state: "Ready" in state, timeouts['ready'], "Ready", cancel_event)
+            logging.info(f"{hostname} is Ready")
+        finally:
+            watcher.close()
 
-        for item in vm_details:
-            
-            host_ip = item['vm_ip']
-            host_obj = item['vm']
-            host_name = host_obj.name
-            new_entry = {}
-            
-            if item['vm_ip'] is not None:
-                for password in passwords:
-                    ssh = paramiko.SSHClient()  # Create a new SSHClient object
-                    ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    def ready_host(self, vm, release, updateadios, cancel_event, parent=None):
 
-                    try:
-                        ssh.connect(host_ip, username=username, password=password)
-                        new_entry['hostname'] = host_name
-                        new_entry['hostip'] = host_ip
-                        new_entry['username'] = username
-                        new_entry['password'] = password
-                        vm_details_with_login.append(new_entry)
-                        logging.info(f"Credentials found for {host_name} : {username} : {password}")
-                        break
-                    except paramiko.ssh_exception.AuthenticationException:
-                        continue
-                    finally:
-                        ssh.close()  # Close the SSHClient object
+        entry = {'host': vm['hostname'], 'ip': vm['hostip'], 'result': 'success', 'error': None}
+        start_time = time.time()
+        try:
+            with self.tracer.span("ready_host", parent=parent, host=vm['hostname']):
+                self.execute_command(vm['hostname'], vm['hostip'], vm['username'], vm['password'], release, updateadios, cancel_event)
+            self.mark_stage("ready_host", vm['hostname'])
+        except Exception as e:
+            logging.error(f"Failed to ready host {vm['hostname']}: {e}")
+            entry['result'] = 'cancelled' if cancel_event.is_set() else 'error'
+            entry['error'] = str(e)
+        entry['duration'] = round(time.time() - start_time, 1)
+        return entry
+
+    def ready_hosts(self, vm_details_with_login, release , updateadios, max_concurrency=None, timeout=None ):
+        """
+        Readies every VM with an IP on a pool of at most max_concurrency workers.
+
+        Hosts still running when timeout seconds pass are told to stop and are
+        reported as 'timeout'; the workers then get up to ready_cancel_grace
+        seconds to wind down before this returns, so the pooled SSH clients are
+        not closed underneath them. Returns one report entry per host.
+        """
+
+        self.report_progress("Readying hosts")
+        max_concurrency = max_concurrency or self.ready_concurrency
+        timeout = timeout or self.ready_timeout
+        vms = []
+        report = []
+        for vm in vm_details_with_login:
+            if vm['hostip'] is None:
+                continue
+            if self.stage_done("ready_host", vm['hostname']):
+                logging.info(f"{vm['hostname']} was readied before the interruption, skipping")
+                report.append({'host': vm['hostname'], 'ip': vm['hostip'], 'result': 'skipped', 'error': None, 'duration': 0.0})
             else:
-                new_entry['hostname'] = host_name
-                new_entry['hostip'] = host_ip
-                new_entry['username'] = None
-                new_entry['password'] = None
-                vm_details_with_login.append(new_entry)
+                vms.append(vm)
+        if not vms:
+            self.run_report['ready_hosts'] = report
+            return report
 
-        return vm_details_with_login    
-    def set_up_aclx(self, vm_details_with_login, hostname, script_name):
-        
-        hostname = hostname.lower()
-        hostip = username = password = None
-        exit_status = 0
-        for item in vm_details_with_login:
-            if hostname in item['hostname']:
-                hostip = item['hostip']
-                username = item['username']
-                password = item['password']
-                break
+        cancel_event = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=min(max_concurrency, len(vms)), thread_name_prefix=f"{self.run_name}-ready-host")
         try:
-            client = paramiko.client.SSHClient()
-            client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            client.connect(hostip, username=username, password=password)
-            
-            logging.info("Starting the aclx restore script.....")
-            stdin,stdout,stderr = client.exec_command(f"chmod 777 {script_name}")
-            logging.info("Permissions changed")
-            exit_status = stdout.channel.recv_exit_status()
-            time.sleep(10)
-            if script_name.endswith('.py'):
-                _stdin,_stdout,_stderr = client.exec_command(f"python3 {script_name}")
-                logging.info("Python aclx db script initiated")
-                output = _stdout.read().decode()
-                error = _stderr.read().decode()
-                exit_status = _stdout.channel.recv_exit_status()
-            else:
-                _stdin,_stdout,_stderr = client.exec_command(f"{script_name}")
-                logging.info("Shell aclx db script initiated")
-                output = _stdout.read().decode()
-                error = _stderr.read().decode()
-                exit_status = _stdout.channel.recv_exit_status()                    
-            if exit_status == 0:
-                logging.info(f"Aclx DB file restore is successful for host {hostname}")
-        except Exception as e:
-            logging.error(f"Error Occurred during aclx db restore : {e}")
+            with self.tracer.span("ready_hosts", hosts=len(vms), updateadios=updateadios):
+                parent = self.tracer.current_span()
+                futures = {executor.submit(self.ready_host, vm, release, updateadios, cancel_event, parent): vm for vm in vms}
+                done, not_done = wait(futures, timeout=timeout)
+            if not_done:
+                logging.error(f"{len(not_done)} hosts not ready after {timeout} seconds, cancelling")
+                cancel_event.set()
+                executor.shutdown(wait=False, cancel_futures=True)
+                # Futures cancelled before they started never complete, so only the started ones are waited on
+                started = [future for future in not_done if not future.cancelled()]
+                _, still_running = wait(started, timeout=self.ready_cancel_grace)
+                if still_running:
+                    logging.warning(f"{len(still_running)} ready_host workers still running {self.ready_cancel_grace} seconds after cancel")
+            for future, vm in futures.items():
+                if future in done:
+                    report.append(future.result())
+                else:
+                    report.append({'host': vm['hostname'], 'ip': vm['hostip'], 'result': 'timeout',
+                                   'error': f"Not ready after {timeout} seconds", 'duration': float(timeout)})
         finally:
-            client.close()
-    def execute_command(self, hostname,  host, username, password, release, updateadios):
-
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        ssh.connect(host, username=username, password=password)
-
-        sec_ssh = paramiko.SSHClient()
-        sec_ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        sec_ssh.connect(host, username=username, password=password)
-
-        # Issue "axcli state" command
-        stdin, stdout, stderr = ssh.exec_command("axcli state | grep STATE | awk 'NR==1'")
-        output = stdout.read().decode()
-
-        # Check if output contains "Running"
-        if "Running" in output:
-            # Issue "kill -9" command
-            stdin, stdout, stderr = ssh.exec_command("kill -9")
-
-            # Poll for output to not contain "Running"
-            while True:
-                stdin, stdout, stderr = ssh.exec_command("axcli state | grep STATE | awk 'NR==1'")
-                output = stdout.read().decode()
-                if "Running" not in output:
-                    break
-                time.sleep(1)
-
-        if "DNR" not in output:
-            stdin, stdout, stderr = ssh.exec_command("axcli dexit -all")
-            output = stdout.read().decode()
-            while True:
-                stdin, stdout, stderr = ssh.exec_command("axcli state | grep STATE | awk 'NR==1'")
-                output = stdout.read().decode()
-                if "DNR" in output:
-                    logging.info(f"Dispatcher set to Not Ready for {hostname}")
-                    break
-                time.sleep(1)
-        
-        time.sleep(20)
-        if updateadios == 1:
+            executor.shutdown(wait=False, cancel_futures=True)
 
-            logging.info(f"Updating {release} Adios Version for {hostname}")
-            stdin, stdout, stderr = ssh.exec_command(f"/usr/adios/axinstall -b {release}")
-            exit_status = stdout.channel.recv_exit_status()
-            if exit_status == 0:
-                logging.info(f"Adios has been Updated for host {hostname}")
+        self.run_report['ready_hosts'] = report
+        return report
+
+    def report_progress(self, message):
+
+        logging.info(message)
+        if self.progress is not None:
+            self.progress(message)
+
+    def discover(self, boxname, force_refresh=False):
+
+        self.report_progress(f"Discovering {boxname}")
+        with self.tracer.span("discovery") as span:
+            discovery = None
+            if force_refresh:
+                self.discovery_cache.invalidate(boxname)
             else:
-                logging.info("Error Occurred : {}".format(exit_status))
-        
-        stdin, stdout, stderr = ssh.exec_command("axcli state | grep STATE | awk 'NR==1'")
-        output = stdout.read().decode()
-        logging.info(f"Configuring Dispatcher for host {hostname}")
-        stdin, stdout, stderr = ssh.exec_command("axcli adiosx config")
-        exit_status = stdout.channel.recv_exit_status()
-        if exit_status == 0:
-            logging.info(f"Dispatcher configured for host {hostname}")
+                discovery = self.cached_discovery(boxname)
+            span['cached'] = discovery is not None
+            if discovery is None:
+                discovery = self.discover_box(boxname)
+                if discovery:
+                    self.discovery_cache.put(boxname, discovery, self.get_inventory(discovery['content']))
+            span['found'] = bool(discovery)
+        if not discovery:
+            return None
+        self.run_report['discovery_cached'] = span['cached']
+        self.tracer.attributes['vcenter'] = discovery['vcenter']
+
+        self.si = discovery['si']
+        self.content = discovery['content']
+        self.inventory = self.get_inventory(discovery['content'])
+        self.run_report['vcenter'] = discovery['vcenter']
+        logging.info(" Fetching the details below ............... ")
+        logging.info(" List of ESX Hosts for " + boxname + ":")
+        for item in discovery['hosts']:
+            logging.info("     " + self.inventory.name(item))
+        logging.info(" List of VMs for " + boxname + ":" )
+        for vm in discovery['vms']:
+            logging.info("     " + self.inventory.name(vm))
+        return discovery
+
+    def checkpoint_flow_key(self, host_management_dict):
+        """Identifies the requested operation; checkpoints of a different request are not resumed."""
+
+        if host_management_dict['esx_reboot'] == "Yes":
+            operation = "esx_reboot"
+        elif host_management_dict['vm_reboot'] == "Yes":
+            operation = "vm_reboot"
         else:
-            logging.info("Error Occurred : {}".format(exit_status))
+            operation = "update_adios"
+        options = [str(host_management_dict.get(key) or "") for key in ('updateadios', 'adios_versions', 'hostname', 'script_name')]
+        return "|".join([operation] + options)
 
-        while True:
-            stdin, stdout, stderr = sec_ssh.exec_command("axcli state | grep STATE | awk 'NR==1'")
-            output = stdout.read().decode()
-            if "Ready" in output:
-                logging.info(f"{hostname} is Ready")
-                break
-            time.sleep(1)
+    def start_checkpoints(self, boxname, host_management_dict):
 
-        ssh.close()
-        sec_ssh.close()
-    def ready_hosts(self, vm_details_with_login, release , updateadios ):
+        self.checkpoint_box = boxname
+        self.checkpoint_flow = self.checkpoint_flow_key(host_management_dict)
+        if not host_management_dict.get('resume'):
+            self.checkpoints.clear(boxname)
+        self.completed_stages = self.checkpoints.completed(boxname, self.checkpoint_flow)
+        if self.completed_stages:
+            stages = sorted({stage for stage, _ in self.completed_stages})
+            logging.info(f"Resuming {boxname}, already done: {', '.join(stages)}")
+            self.run_report['resumed_stages'] = stages
 
-        threads = []
-        for vm in vm_details_with_login:
+    def stage_done(self, stage, subject=''):
+        return (stage, subject) in self.completed_stages
 
-            hostname = vm['hostname'] 
-            host = vm['hostip']
-            username = vm['username']
-            password = vm['password']
-            
-
-            if host is not None:
-                
-                thread = threading.Thread(target=self.execute_command, args=(hostname, host, username, password, release, updateadios))
-                threads.append(thread)
-                thread.start()
-            
-        for thread in threads:
-            thread.join()
-            
-    def main(self, host_management_dict):
-        
+    def mark_stage(self, stage, subject='', data=None):
+
+        if self.checkpoint_flow is None:
+            return
+        self.checkpoints.mark(self.checkpoint_box, self.checkpoint_flow, stage, subject, data)
+        self.completed_stages[(stage, subject)] = data
+
+    def run_stage(self, stage, fn, *args, succeeded=None):
+        """
+        Runs one box-level stage unless an earlier, interrupted run already completed it.
+
+        The stage is checkpointed once fn returns and succeeded(result) holds (any
+        result counts when succeeded is None), so failed stages run again on resume.
+        """
+
+        if self.stage_done(stage):
+            logging.info(f"Skipping {stage}, already done before the interruption")
+            return None
+        result = fn(*args)
+        if succeeded is None or succeeded(result):
+            self.mark_stage(stage)
+        return result
+
+    def no_errors(self, report):
+        return all(entry.get('error') is None for entry in report)
+
+    def consoles_ready(self, report):
+        return all(entry['state'] == 'ready' for entry in report)
+
+    def checkpoint_vm_ips(self, vm_details):
+        """VMs lose their IPs while powered off, so a resumed run takes them from the checkpoint."""
+
+        saved = self.completed_stages.get(('vm_ips', '')) or {}
+        for item in vm_details:
+            if item['vm_ip'] is None:
+                item['vm_ip'] = saved.get(item['vm']._moId)
+        self.mark_stage('vm_ips', data={item['vm']._moId: item['vm_ip'] for item in vm_details})
+        return vm_details
+
+    def run_succeeded(self):
+
+        entries = (self.run_report.get('power', []) + self.run_report.get('esx_reboot', [])
+                   + self.run_report.get('ready_hosts', []))
+        return self.no_errors(entries) and self.run_report.get('aclx', True)
+
+    def run_operations(self, host_management_dict, discovery):
+
+        boxname = host_management_dict['system'].upper()
+        found_content = discovery['content']
+        matched_hosts, matched_vms = discovery['hosts'], discovery['vms']
+
+        # Check if we have any VMs before proceeding
+        if len(matched_vms) == 0:
+            logging.warning("WARNING: No VMs found for " + boxname + ". Cannot proceed with operations.")
+            return
+
+        updateadios = 1 if host_management_dict.get('updateadios') == "Yes" else 0
+        release = host_management_dict.get('adios_versions')
+        self.start_checkpoints(boxname, host_management_dict)
+
+        if host_management_dict['esx_reboot'] == "Yes":
+
+            matched_vm_with_ips = self.checkpoint_vm_ips(self.get_vm_ip(matched_vms))
+            # Power states and IPs are about to change; the next run has to discover again
+            self.discovery_cache.invalidate(boxname)
+            self.run_stage("power_off", self.power_off_vms, matched_vms, succeeded=self.no_errors)
+            self.run_stage("esx_reboot", self.reboot_hosts_rolling, found_content, matched_hosts,
+                           host_management_dict.get('esx_batch_size', 1), succeeded=self.no_errors)
+            self.run_stage("power_on", self.power_on_vms, matched_vms, succeeded=self.no_errors)
+            self.run_stage("console_wait", self.wait_for_vm_console_ready, matched_vm_with_ips,
+                           succeeded=self.consoles_ready)
+            match_vms_with_cred = self.get_vm_credentials(matched_vm_with_ips)
+            if 'script_name' in host_management_dict and 'hostname' in host_management_dict:
+                self.run_stage("aclx", self.set_up_aclx, match_vms_with_cred, host_management_dict['hostname'],
+                               host_management_dict['script_name'], succeeded=bool)
+            self.ready_hosts( match_vms_with_cred, release , updateadios)
+
+        if host_management_dict['vm_reboot'] == "Yes" and host_management_dict['esx_reboot'] == "No":
+
+            matched_vm_with_ips = self.checkpoint_vm_ips(self.get_vm_ip(matched_vms))
+            self.discovery_cache.invalidate(boxname)
+            if not self.stage_done("power_off"):
+                self.run_stage("power_off", self.power_off_vms, matched_vms, succeeded=self.no_errors)
+                time.sleep(60)
+            self.run_stage("power_on", self.power_on_vms, matched_vms, succeeded=self.no_errors)
+            self.run_stage("console_wait", self.wait_for_vm_console_ready, matched_vm_with_ips,
+                           succeeded=self.consoles_ready)
+            match_vms_with_cred = self.get_vm_credentials(matched_vm_with_ips)
+            if 'script_name' in host_management_dict and 'hostname' in host_management_dict:
+                self.run_stage("aclx", self.set_up_aclx, match_vms_with_cred, host_management_dict['hostname'],
+                               host_management_dict['script_name'], succeeded=bool)
+            self.ready_hosts( match_vms_with_cred, release , updateadios)
+
+        if updateadios == 1 and host_management_dict['esx_reboot'] == "No" and host_management_dict['vm_reboot'] == "No":
+
+            matched_vm_with_ips = self.get_vm_ip(matched_vms)
+            match_vms_with_cred = self.get_vm_credentials(matched_vm_with_ips)
+            if 'script_name' in host_management_dict and 'hostname' in host_management_dict:
+                self.run_stage("aclx", self.set_up_aclx, match_vms_with_cred, host_management_dict['hostname'],
+                               host_management_dict['script_name'], succeeded=bool)
+            self.ready_hosts( match_vms_with_cred, release , updateadios)
+
+        if self.run_succeeded():
+            self.checkpoints.clear(boxname)
+
+    def property_fetches(self):
+        """vCenter property traffic of this run, summed over every inventory it loaded."""
+
+        totals = {'calls': 0, 'objects': 0, 'properties': 0}
+        for inventory in self.inventories.values():
+            for key in totals:
+                totals[key] += inventory.stats[key]
+        return totals
+
+    def log_property_fetches(self):
+
+        totals = self.property_fetches()
+        logging.info(f"Property fetches: {totals['calls']} collector calls, {totals['objects']} objects, "
+                     f"{totals['properties']} properties")
+        return totals
+
+    def main(self, host_management_dict, progress=None, vcenter_slot=None):
+        """
+        Discovers one box and runs the requested operations on it; returns the run report.
+
+        vcenter_slot, when given, is called with the owning vCenter and must return a
+        context manager; operations run inside it (the batch scheduler uses it to cap
+        concurrent boxes per vCenter).
+        """
         
-        found = 0
         boxname = host_management_dict['system'].upper()
         LOG_FOLDER = "Logs"
       
@@ -542,106 +894,45 @@ class HostManagement:
         else:
             print("Logs folder already exists. Not creating again.")
 
-        filename='{}_log_{}.log'.format(boxname,datetime.now().strftime('%Y-%m-%d_%H-%M-%S'))
+        timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+        filename='{}_log_{}.log'.format(boxname,timestamp)
+
+        # Only this run's threads write to its log file, so several boxes can run side by side
+        self.run_name = f"{boxname}_{timestamp}"
+        self.progress = progress
+        run_thread = threading.current_thread()
+        thread_name = run_thread.name
+        run_thread.name = self.run_name
+        log_handler = start_run_log(self.run_name, os.path.join(LOG_FOLDER, filename))
+        self.run_report['box'] = boxname
+        self.run_report['log_file'] = os.path.join(LOG_FOLDER, filename)
+        trace_file = os.path.join(LOG_FOLDER, '{}_trace_{}.jsonl'.format(boxname, timestamp))
+        self.tracer = RunTracer(trace_file, box=boxname, run=self.run_name)
+        self.run_report['trace_file'] = trace_file
 
-        logging.basicConfig(
-                            level=logging.INFO, 
-                            format='%(asctime)s - %(levelname)s - %(message)s',                          
-                            handlers=[
-                                    logging.FileHandler(os.path.join(LOG_FOLDER, filename)),   # write logs to Logs/ folder
-                                    logging.StreamHandler()                                     # optional: also print logs to console
-                                ]
-                            )
-        
         logging.info("------------- Start of Script --------------")
-        for vcenter in self.all_data_centers:
-            
-            self.si = self.connect_vcenter( vcenter['vcenter_server'], vcenter['username'], vcenter['password'])
-            self.content = self.si.RetrieveContent()
-        
-            folder = self.find_folder_by_name(self.content, boxname)
-            
-            if folder:
-                logging.info(f"DEBUG: Found folder '{folder.name}' in vCenter: {vcenter['vcenter_server']}")
-                found = 1
-                logging.info("Details found in vCenter : " + vcenter['vcenter_server'])
-                matched_hosts, matched_vms = self.get_hosts_and_vms_from_folder(self.content, folder)
-                found_content = self.content
-                break
-            else:
-                logging.info(f"DEBUG: Folder '{boxname}' not found in vCenter: {vcenter['vcenter_server']}")
-           
-            if not folder:
-
-                all_details =  self.find_vms_with_system_name(self.content, boxname)
-                if all_details['hosts'] and all_details['vms']:
-                    found = 1
-                    matched_hosts, matched_vms = all_details['hosts'], all_details['vms']               
-                    logging.info("Details found in vCenter : " + vcenter['vcenter_server'])
-                    found_content = self.content
-                else:                   
-                    logging.info("Details Not found in vCenter : " + vcenter['vcenter_server'])
-                    
-        if found == 1:
-            logging.info(" Fetching the details below ............... ")
-            logging.info(" List of ESX Hosts for " + boxname + ":")
-            for item in matched_hosts:
-                logging.info("     " + item.name)
-            logging.info(" List of VMs for " + boxname + ":" )
-            for vm in matched_vms:
-                logging.info("     " + vm.name)
-
-            # Check if we have any VMs before proceeding
-            if len(matched_vms) == 0:
-                logging.warning("WARNING: No VMs found for " + boxname + ". Cannot proceed with operations.")
-                logging.info("------------- End of Script --------------")
-                return
-
-            if host_management_dict['esx_reboot'] == "Yes":
-
-                matched_vm_with_ips = self.get_vm_ip(matched_vms)
-                self.power_off_vms(matched_vms)
-                self.enter_maintainence_mode(found_content, matched_hosts)
-                self.reboot_host(found_content, matched_hosts)
-                self.exit_maintainence_mode(found_content, matched_hosts)
-                self.power_on_vms(matched_vms)
-                self.wait_for_vm_console_ready(matched_vm_with_ips)
-                match_vms_with_cred = self.get_vm_credentials(matched_vm_with_ips)
-                if 'script_name' in host_management_dict and 'hostname' in host_management_dict:
-                    self.set_up_aclx(match_vms_with_cred, host_management_dict['hostname'], host_management_dict['script_name'] )
-                if host_management_dict['updateadios'] == "Yes":
-                    self.ready_hosts( match_vms_with_cred, host_management_dict['adios_versions'] , 1)
-                else:
-                    self.ready_hosts( match_vms_with_cred, host_management_dict['adios_versions'] , 0)
-                logging.info("------------- End of Script --------------")
-            
-            if host_management_dict['vm_reboot'] == "Yes" and host_management_dict['esx_reboot'] == "No":
-                
-                matched_vm_with_ips = self.get_vm_ip(matched_vms)
-                self.power_off_vms(matched_vms)
-                time.sleep(60)
-                self.power_on_vms(matched_vms)
-                self.wait_for_vm_console_ready(matched_vm_with_ips)
-                match_vms_with_cred = self.get_vm_credentials(matched_vm_with_ips)
-                if 'script_name' in host_management_dict and 'hostname' in host_management_dict:
-                    self.set_up_aclx(match_vms_with_cred, host_management_dict['hostname'], host_management_dict['script_name'] )
-                if host_management_dict['updateadios'] == "Yes":
-                    self.ready_hosts( match_vms_with_cred, host_management_dict['adios_versions'] , 1)
-                else:
-                    self.ready_hosts( match_vms_with_cred, host_management_dict['adios_versions'] , 0)
-                logging.info("------------- End of Script --------------")
-
-            if host_management_dict['updateadios'] == "Yes" and host_management_dict['esx_reboot'] == "No" and host_management_dict['vm_reboot'] == "No":
-                
-                matched_vm_with_ips = self.get_vm_ip(matched_vms)
-                match_vms_with_cred = self.get_vm_credentials(matched_vm_with_ips)
-                if 'script_name' in host_management_dict and 'hostname' in host_management_dict:
-                    self.set_up_aclx(match_vms_with_cred, host_management_dict['hostname'], host_management_dict['script_name'] )
-                if host_management_dict['updateadios'] == "Yes":
-                    self.ready_hosts( match_vms_with_cred, host_management_dict['adios_versions'] , 1)
-                else:
-                    self.ready_hosts( match_vms_with_cred, host_management_dict['adios_versions'] , 0)
-                logging.info("------------- End of Script --------------")
+        try:
+            with self.tracer.span("run"):
+                discovery = self.discover(boxname, host_management_dict.get('force_refresh', False))
 
-        else:
-            logging.info( " No Details are found . Please verify manually ")
\ No newline at end of file
+                if discovery:
+                    if vcenter_slot is None:
+                        self.run_operations(host_management_dict, discovery)
+                    else:
+                        self.report_progress(f"Waiting for a slot on {discovery['vcenter']}")
+                        with ExitStack() as slot:
+                            with self.tracer.span("vcenter_slot_wait"):
+                                slot.enter_context(vcenter_slot(discovery['vcenter']))
+                            self.run_operations(host_management_dict, discovery)
+                else:
+                    logging.info( " No Details are found . Please verify manually ")
+            logging.info("------------- End of Script --------------")
+        finally:
+            # SSH connections live for one run only
+            self.ssh_pool.close_all()
+            self.run_report['property_fetches'] = self.log_property_fetches()
+            self.run_report['timing'] = self.tracer.close()
+            stop_run_log(log_handler)
+            run_thread.name = thread_name
+
+        return self.run_report
@@ -0,0 +1,130 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pyVmomi import vim
+from services.vcenter_tasks import TaskWaiter, task_error_message, wait_for_property
+from services.run_tracer import RunTracer
+
+
+class RollingHostReboot:
+    """
+    Reboots ESX hosts with up to batch_size hosts in flight.
+
+    Each host runs its own state machine:
+    enter_maintenance -> reboot -> wait_disconnect -> wait_reconnect -> exit_maintenance.
+    A host that fails a step stops there; the other hosts carry on.
+    Steps listed in completed_steps[name] are skipped (resuming an interrupted run)
+    and on_step_done(name, step) is called after every step that succeeds.
+    A reboot only counts once the host was seen notResponding or came back with
+    a new runtime.bootTime; a host that never went down fails in wait_disconnect.
+    """
+
+    STEPS = ['enter_maintenance', 'reboot', 'wait_disconnect', 'wait_reconnect', 'exit_maintenance']
+
+    def __init__(self, content, batch_size=1, maintenance_timeout=300, disconnect_timeout=1800, reconnect_timeout=1800,
+                 reboot_task_timeout=60, thread_name_prefix="esx-reboot", tracer=None, completed_steps=None,
+                 on_step_done=None):
+        self.content = content
+        self.batch_size = max(1, int(batch_size))
+        self.maintenance_timeout = maintenance_timeout
+        self.disconnect_timeout = disconnect_timeout
+        self.reconnect_timeout = reconnect_timeout
+        self.reboot_task_timeout = reboot_task_timeout
+        self.thread_name_prefix = thread_name_prefix
+        self.tracer = tracer or RunTracer()
+        self.completed_steps = completed_steps or {}
+        self.on_step_done = on_step_done
+        self.boot_times = {}   # host name -> runtime.bootTime before the reboot
+
+    def run(self, hosts):
+        """hosts is a list of (name, HostSystem); returns one report entry per host."""
+        with ThreadPoolExecutor(max_workers=self.batch_size, thread_name_prefix=self.thread_name_prefix) as executor:
+            parent = self.tracer.current_span()
+            futures = [executor.submit(self.cycle_host, name, host, parent) for name, host in hosts]
+            return [future.result() for future in futures]
+
+    def cycle_host(self, name, host, parent=None):
+        report = {'host': name, 'state': None, 'result': 'success', 'error': None}
+        start_time = time.time()
+        done = set(self.completed_steps.get(name, ()))
+        if 'reboot' in done:
+            # The disconnect may have happened while nobody was watching; go straight to reconnect
+            done.add('wait_disconnect')
+        for step in self.STEPS:
+            report['state'] = step
+            if step in done:
+                logging.info(f"Host {name}: {step} already done, skipping")
+                continue
+            try:
+                with self.tracer.span(f"esx_reboot.{step}", parent=parent, host=name):
+                    getattr(self, step)(name, host)
+                if self.on_step_done is not None:
+                    self.on_step_done(name, step)
+            except Exception as e:
+                logging.error(f"Host {name} failed during {step}: {e}")
+                report['result'] = 'error'
+                report['error'] = str(e)
+                break
+        else:
+            report['state'] = 'done'
+        report['duration'] = round(time.time() - start_time, 1)
+        return report
+
+    def _wait_task(self, task, timeout):
+        waiter = TaskWaiter(self.content)
+        try:
+            return waiter.wait([task], timeout)[task._moId]
+        finally:
+            waiter.close()
+
+    def _run_task(self, task, timeout):
+        result = self._wait_task(task, timeout)
+        if result['state'] != vim.TaskInfo.State.success:
+            raise RuntimeError(task_error_message(result['error']) if result['error'] else result['state'])
+
+    def enter_maintenance(self, name, host):
+        if host.runtime.inMaintenanceMode:
+            logging.info(f"The host {name} is already in maintenance mode")
+            return
+        self._run_task(host.EnterMaintenanceMode_Task(timeout=self.maintenance_timeout, evacuatePoweredOffVms=False),
+                       self.maintenance_timeout + 60)
+        logging.info(f"Host {name} in maintenance mode")
+
+    def reboot(self, name, host):
+        logging.info(f"Initiating reboot for host: {name}")
+        self.boot_times[name] = host.runtime.bootTime
+        task = host.RebootHost_Task(force=True)
+        # vCenter may lose the host before the task reports back, so only an error fails the step
+        result = self._wait_task(task, self.reboot_task_timeout)
+        if result['state'] == vim.TaskInfo.State.error:
+            raise RuntimeError(task_error_message(result['error']) if result['error'] else "reboot task failed")
+
+    def rebooted(self, name, host):
+        """True once the host reports a different boot time than before the reboot."""
+        before = self.boot_times.get(name)
+        return before is not None and host.runtime.bootTime != before
+
+    def wait_disconnect(self, name, host):
+        if self.rebooted(name, host):
+            logging.info(f"Host {name} already came back with a new boot time")
+            return
+        matched, state = wait_for_property(self.content, host, 'runtime.connectionState',
+                                           lambda value: str(value).lower() == "notresponding", self.disconnect_timeout)
+        logging.info(f"[WaitUp] {name} connectionState={state}")
+        if not matched and not self.rebooted(name, host):
+            raise TimeoutError(f"did not go down within {self.disconnect_timeout}s of the reboot "
+                               f"(connectionState={state}, boot time unchanged)")
+
+    def wait_reconnect(self, name, host):
+        matched, state = wait_for_property(self.content, host, 'runtime.connectionState',
+                                           lambda value: str(value).lower() == "connected", self.reconnect_timeout)
+        if not matched:
+            raise TimeoutError(f"not connected after {self.reconnect_timeout}s (connectionState={state})")
+        logging.info(f"Host {name} is connected")
+
+    def exit_maintenance(self, name, host):
+        if not host.runtime.inMaintenanceMode:
+            logging.info(f"The host {name} is already Not in maintenance mode")
+            return
+        self._run_task(host.ExitMaintenanceMode_Task(timeout=self.maintenance_timeout), self.maintenance_timeout + 60)
+        logging.info(f"Host {name} is Not in maintenance mode")
@@ -0,0 +1,139 @@
+import json
+import logging
+import sqlite3
+import threading
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+
+DEFAULT_DB_PATH = 'host_jobs.db'
+
+
+class JobStore:
+    """SQLite table of submitted host management jobs, their progress and their results."""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self.init_db()
+
+    def init_db(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                box_name TEXT NOT NULL,
+                status TEXT NOT NULL,
+                progress TEXT,
+                params TEXT,
+                result TEXT,
+                error TEXT,
+                submitted_at TIMESTAMP,
+                started_at TIMESTAMP,
+                finished_at TIMESTAMP
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_submitted_at ON jobs(submitted_at)')
+        conn.commit()
+        conn.close()
+
+    def _execute(self, query, params=()):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(query, params)
+        conn.commit()
+        conn.close()
+
+    def create(self, job_id, box_name, params):
+        self._execute('''
+            INSERT INTO jobs (job_id, box_name, status, params, submitted_at)
+            VALUES (?, ?, 'queued', ?, ?)
+        ''', (job_id, box_name, json.dumps(params, default=str), datetime.now().isoformat(timespec='seconds')))
+
+    def mark_running(self, job_id):
+        self._execute("UPDATE jobs SET status = 'running', started_at = ? WHERE job_id = ?",
+                      (datetime.now().isoformat(timespec='seconds'), job_id))
+
+    def set_progress(self, job_id, progress):
+        self._execute('UPDATE jobs SET progress = ? WHERE job_id = ?', (progress, job_id))
+
+    def finish(self, job_id, status, result=None, error=None):
+        self._execute('''
+            UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE job_id = ?
+        ''', (status, json.dumps(result, default=str) if result is not None else None, error,
+              datetime.now().isoformat(timespec='seconds'), job_id))
+
+    def mark_interrupted(self):
+        """Jobs still queued or running belong to a previous server process that is gone."""
+        self._execute('''
+            UPDATE jobs SET status = 'interrupted', finished_at = ?
+            WHERE status IN ('queued', 'running')
+        ''', (datetime.now().isoformat(timespec='seconds'),))
+
+    def get(self, job_id):
+        jobs = self._select('WHERE job_id = ?', (job_id,))
+        return jobs[0] if jobs else None
+
+    def recent(self, limit=20):
+        return self._select('ORDER BY submitted_at DESC LIMIT ?', (limit,))
+
+    def _select(self, clause, params):
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute(f'SELECT * FROM jobs {clause}', params).fetchall()
+        conn.close()
+        jobs = []
+        for row in rows:
+            job = dict(row)
+            job['params'] = json.loads(job['params']) if job['params'] else {}
+            job['result'] = json.loads(job['result']) if job['result'] else None
+            jobs.append(job)
+        return jobs
+
+
+class JobRunner:
+    """
+    Runs host management jobs on a background thread pool.
+
+    submit() returns a job id straight away; the page polls the job table for
+    status and progress, so a job keeps running when the browser tab goes away.
+    """
+
+    def __init__(self, max_workers=4, store=None):
+        self.store = store or JobStore()
+        self.store.mark_interrupted()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="host-job")
+        self.futures = {}
+        self.lock = threading.Lock()
+
+    def submit(self, box_name, params, target):
+        """target(progress) runs in the background; progress(message) records how far it got."""
+        job_id = uuid.uuid4().hex[:12]
+        self.store.create(job_id, box_name, params)
+        future = self.executor.submit(self._run, job_id, target)
+        with self.lock:
+            self.futures[job_id] = future
+        return job_id
+
+    def _run(self, job_id, target):
+        self.store.mark_running(job_id)
+        try:
+            result = target(lambda message: self.store.set_progress(job_id, message))
+        except Exception as e:
+            logging.error(f"Job {job_id} failed: {e}")
+            self.store.finish(job_id, 'failed', error=traceback.format_exc())
+        else:
+            self.store.finish(job_id, 'completed', result=result)
+        finally:
+            with self.lock:
+                self.futures.pop(job_id, None)
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def recent(self, limit=20):
+        return self.store.recent(limit)
+
+    def active_count(self):
+        with self.lock:
+            return len(self.futures)
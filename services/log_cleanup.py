@@ -27,7 +27,7 @@ class LogCleanup:
             return old_logs
             
         for filename in os.listdir(self.log_dir):
-            if filename.endswith(".log"):
+            if filename.endswith((".log", ".jsonl")):
                 file_path = os.path.join(self.log_dir, filename)
                 age_hours = self.get_log_age_hours(file_path)
                 
@@ -0,0 +1,82 @@
+import os
+import threading
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+load_dotenv()
+
+DEFAULT_BASE_URL = 'https://qtest.gtie.dell.com/api/v3'
+DEFAULT_PROJECT_ID = '442'
+DEFAULT_TIMEOUT = (5, 60)   # (connect, read) seconds
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class QtestClient:
+    """
+    Shared HTTP session for the qTest API.
+
+    Connections are kept alive and pooled per host, every request has a timeout,
+    and idempotent requests (GET/PUT/DELETE) are retried with exponential backoff
+    on connection errors, 429 and 5xx, honouring Retry-After. POSTs are never
+    retried since they create test steps and attachments. Auth headers are passed
+    per call because one client serves every signed-in user.
+    """
+
+    def __init__(self, base_url=None, project_id=None, timeout=DEFAULT_TIMEOUT, pool_size=16, retries=3,
+                 backoff_factor=0.5):
+        self.base_url = (base_url or os.getenv('QTEST_API_BASE_URL', DEFAULT_BASE_URL)).rstrip('/')
+        self.project_id = project_id or os.getenv('QTEST_PROJECT_ID', DEFAULT_PROJECT_ID)
+        self.timeout = timeout
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(['GET', 'PUT', 'DELETE']),
+            respect_retry_after_header=True,
+            raise_on_status=False,   # hand the last response back; callers check status codes themselves
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def url(self, path, project=True):
+        """Full URL of path, relative to the project unless project is False."""
+        prefix = f"{self.base_url}/projects/{self.project_id}" if project else self.base_url
+        return f"{prefix}/{path.lstrip('/')}"
+
+    def request(self, method, path, project=True, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.request(method, self.url(path, project), **kwargs)
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def put(self, path, **kwargs):
+        return self.request('PUT', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request('DELETE', path, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+_qtest_client = None
+_qtest_client_lock = threading.Lock()
+
+
+def get_qtest_client():
+    """Process-wide client, so every page and service shares one connection pool."""
+    global _qtest_client
+    with _qtest_client_lock:
+        if _qtest_client is None:
+            _qtest_client = QtestClient()
+        return _qtest_client
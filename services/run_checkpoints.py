@@ -0,0 +1,65 @@
+import json
+import sqlite3
+import time
+
+
+DEFAULT_DB_PATH = 'run_checkpoints.db'
+DEFAULT_MAX_AGE = 24 * 3600
+
+
+class CheckpointStore:
+    """
+    SQLite record of the stages a host management run has completed, per box.
+
+    A stage is completed either for the whole box (subject '') or for one host or
+    VM of it, and can carry a small JSON payload the resumed run needs (e.g. VM IPs
+    that are gone while the VMs are powered off). Checkpoints belong to one flow
+    (operation and its parameters), so a different request on the same box starts
+    from scratch; they are ignored once older than max_age.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, max_age=DEFAULT_MAX_AGE):
+        self.db_path = db_path
+        self.max_age = max_age
+        self.init_db()
+
+    def init_db(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS run_checkpoint (
+                box_name TEXT NOT NULL,
+                flow TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                data TEXT,
+                completed_at REAL NOT NULL,
+                PRIMARY KEY (box_name, flow, stage, subject)
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def completed(self, box_name, flow):
+        """Returns {(stage, subject): data} for every live checkpoint of box_name in flow."""
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute('''
+            SELECT stage, subject, data FROM run_checkpoint
+            WHERE box_name = ? AND flow = ? AND completed_at >= ?
+        ''', (box_name, flow, time.time() - self.max_age)).fetchall()
+        conn.close()
+        return {(stage, subject): json.loads(data) if data else None for stage, subject, data in rows}
+
+    def mark(self, box_name, flow, stage, subject='', data=None):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('''
+            INSERT OR REPLACE INTO run_checkpoint (box_name, flow, stage, subject, data, completed_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (box_name, flow, stage, subject, json.dumps(data) if data is not None else None, time.time()))
+        conn.commit()
+        conn.close()
+
+    def clear(self, box_name):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('DELETE FROM run_checkpoint WHERE box_name = ?', (box_name,))
+        conn.commit()
+        conn.close()
@@ -0,0 +1,108 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+
+class RunTracer:
+    """
+    Records how long each phase and sub-step of a run takes.
+
+    Spans carry the run's base attributes (box, vCenter) plus their own (host, VM, ...)
+    and are appended as JSON lines to path as they finish; with no path they are only
+    kept in memory. Nesting follows the calling thread; spans opened on worker threads
+    can name their parent explicitly.
+    """
+
+    def __init__(self, path=None, **attributes):
+        self.path = path
+        self.attributes = attributes
+        self.spans = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.file = open(path, 'a', encoding='utf-8') if path else None
+
+    def _stack(self):
+        if not hasattr(self.local, 'stack'):
+            self.local.stack = []
+        return self.local.stack
+
+    def current_span(self):
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def span(self, name, parent=None, **attributes):
+        """Times the with-block; the yielded dict can take extra attributes while it runs."""
+        stack = self._stack()
+        span_id = uuid.uuid4().hex[:12]
+        parent = parent or (stack[-1] if stack else None)
+        extra = {}
+        start_time = time.time()
+        stack.append(span_id)
+        status, error = 'ok', None
+        try:
+            yield extra
+        except Exception as e:
+            status, error = 'error', str(e)
+            raise
+        finally:
+            stack.pop()
+            self._write(dict(attributes, **extra), name, span_id, parent, start_time, time.time(), status, error)
+
+    def record(self, name, start_time, end_time, parent=None, status='ok', error=None, **attributes):
+        """Adds a span for a step that was timed elsewhere (e.g. a task tracked by a waiter)."""
+        self._write(attributes, name, uuid.uuid4().hex[:12], parent or self.current_span(),
+                    start_time, end_time, status, error)
+
+    def _write(self, attributes, name, span_id, parent, start_time, end_time, status, error):
+        span = {
+            'type': 'span',
+            'name': name,
+            'span_id': span_id,
+            'parent_id': parent,
+            'start': datetime.fromtimestamp(start_time).isoformat(timespec='milliseconds'),
+            'end': datetime.fromtimestamp(end_time).isoformat(timespec='milliseconds'),
+            'duration': round(end_time - start_time, 3),
+            'status': status,
+            'error': error,
+            'thread': threading.current_thread().name,
+        }
+        span.update(self.attributes)
+        span.update(attributes)
+        with self.lock:
+            self.spans.append(span)
+            if self.file is not None:
+                self.file.write(json.dumps(span, default=str) + '\n')
+                self.file.flush()
+
+    def summary(self):
+        """Count, total, max and error count of every span name, in order of first appearance."""
+        phases = {}
+        with self.lock:
+            spans = list(self.spans)
+        for span in spans:
+            phase = phases.setdefault(span['name'], {'name': span['name'], 'count': 0, 'total': 0.0, 'max': 0.0, 'errors': 0})
+            phase['count'] += 1
+            phase['total'] = round(phase['total'] + span['duration'], 3)
+            phase['max'] = max(phase['max'], span['duration'])
+            phase['errors'] += span['status'] != 'ok'
+        return list(phases.values())
+
+    def close(self):
+        """Logs and writes the summary, then closes the trace file."""
+        summary = self.summary()
+        if summary:
+            logging.info("Phase timing (count / total s / max s):")
+            for phase in summary:
+                logging.info(f"     {phase['name']}: {phase['count']} / {phase['total']:.1f} / {phase['max']:.1f}"
+                             + (f" ({phase['errors']} failed)" if phase['errors'] else ""))
+        with self.lock:
+            if self.file is not None:
+                self.file.write(json.dumps(dict(self.attributes, type='summary', phases=summary), default=str) + '\n')
+                self.file.close()
+                self.file = None
+        return summary
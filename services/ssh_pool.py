@@ -0,0 +1,77 @@
+import logging
+import threading
+import paramiko
+
+
+class SshConnectionPool:
+    """
+    One authenticated SSH transport per (host, username), shared for the whole run.
+
+    paramiko multiplexes every exec_command on its own channel over the same
+    transport, so callers on different threads can use the client concurrently
+    and only the first caller for a host pays for the handshake. A pooled client
+    is only handed out for the password it authenticated with; any other password
+    evicts it and authenticates again.
+    """
+
+    def __init__(self, timeout=10, keepalive_interval=30, port=22):
+        self.timeout = timeout
+        self.port = port
+        self.keepalive_interval = keepalive_interval
+        self.clients = {}   # (host, username) -> paramiko.SSHClient
+        self.passwords = {}  # (host, username) -> password the pooled client logged in with
+        self.lock = threading.Lock()
+        self.key_locks = {}
+
+    def _key_lock(self, key):
+        with self.lock:
+            return self.key_locks.setdefault(key, threading.Lock())
+
+    def get(self, host, username, password):
+        """
+        Returns a connected client for host/username, connecting only when needed.
+        Raises paramiko.AuthenticationException for a bad password and socket/SSH errors otherwise.
+        """
+        key = (host, username)
+        with self._key_lock(key):
+            with self.lock:
+                client = self.clients.get(key)
+                pooled_password = self.passwords.get(key)
+            if client is not None:
+                transport = client.get_transport()
+                if transport is not None and transport.is_active() and pooled_password == password:
+                    return client
+                self.evict(key)
+
+            client = paramiko.SSHClient()
+            client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            try:
+                client.connect(host, port=self.port, username=username, password=password, timeout=self.timeout,
+                               banner_timeout=self.timeout, auth_timeout=self.timeout,
+                               look_for_keys=False, allow_agent=False)
+            except Exception:
+                client.close()
+                raise
+            client.get_transport().set_keepalive(self.keepalive_interval)
+            with self.lock:
+                self.clients[key] = client
+                self.passwords[key] = password
+            return client
+
+    def evict(self, key):
+        with self.lock:
+            client = self.clients.pop(key, None)
+            self.passwords.pop(key, None)
+        if client is not None:
+            client.close()
+
+    def close_all(self):
+        with self.lock:
+            clients = list(self.clients.items())
+            self.clients.clear()
+            self.passwords.clear()
+        for (host, username), client in clients:
+            try:
+                client.close()
+            except Exception as e:
+                logging.info(f"Error closing SSH connection to {username}@{host}: {e}")
@@ -0,0 +1,37 @@
+from services.fetch_testcase import Testcase
+
+
+class TestcaseContext:
+    """
+    One test case as seen by a single update request.
+
+    Resolves the TC- PID to the numeric id and full payload with one GET, on first
+    use, and is then handed to every Updatetestcase operation of the request so
+    none of them has to look the test case up again. When only the id is needed
+    and the PID is in the id cache, no GET is made at all.
+    """
+
+    def __init__(self, service, pid, data=None):
+        self.service = service   # Testcase or Updatetestcase: supplies the client and headers
+        self.pid = pid
+        self._data = data
+        self._id = data['id'] if data else None
+
+    @property
+    def data(self):
+        if self._data is None:
+            data = Testcase.fetch_all_testcase_fields(self.service, self.pid)
+            if not isinstance(data, dict) or 'id' not in data:
+                message = data.get('message') if isinstance(data, dict) else None
+                raise ValueError(message or f"Test case {self.pid} not found")
+            self._data = data
+            self._id = data['id']
+        return self._data
+
+    @property
+    def id(self):
+        if self._id is None:
+            self._id = self.service.id_cache.get(self.service.client.project_id, self.pid)
+        if self._id is None:
+            self._id = self.data['id']
+        return self._id
@@ -0,0 +1,69 @@
+import sqlite3
+import threading
+import time
+
+
+DEFAULT_DB_PATH = 'testcase_ids.db'
+
+
+class TestcaseIdCache:
+    """
+    SQLite map of qTest test case PIDs (TC-xxxxx) to their numeric ids, per project.
+
+    The mapping never changes once a test case exists, so entries do not expire.
+    It is filled from every test case fetch and in bulk from search results, and
+    lets attachment and test step calls skip the lookup GET.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self.init_db()
+
+    def init_db(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS testcase_id (
+                project_id TEXT NOT NULL,
+                pid TEXT NOT NULL,
+                id INTEGER NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (project_id, pid)
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def get(self, project_id, pid):
+        conn = sqlite3.connect(self.db_path)
+        row = conn.execute('SELECT id FROM testcase_id WHERE project_id = ? AND pid = ?',
+                           (str(project_id), pid)).fetchone()
+        conn.close()
+        return row[0] if row else None
+
+    def put(self, project_id, pid, id):
+        self.put_many(project_id, [(pid, id)])
+
+    def put_many(self, project_id, pairs):
+        """Stores (pid, id) pairs; returns how many were given."""
+        now = time.time()
+        rows = [(str(project_id), pid, id, now) for pid, id in pairs]
+        conn = sqlite3.connect(self.db_path)
+        conn.executemany('''
+            INSERT OR REPLACE INTO testcase_id (project_id, pid, id, updated_at) VALUES (?, ?, ?, ?)
+        ''', rows)
+        conn.commit()
+        conn.close()
+        return len(rows)
+
+
+_testcase_id_cache = None
+_testcase_id_cache_lock = threading.Lock()
+
+
+def get_testcase_id_cache():
+    """Process-wide cache, shared by every session of the app."""
+    global _testcase_id_cache
+    with _testcase_id_cache_lock:
+        if _testcase_id_cache is None:
+            _testcase_id_cache = TestcaseIdCache()
+        return _testcase_id_cache
@@ -1,19 +1,24 @@
-import requests
 import os
 import json
 from dotenv import load_dotenv
 from datetime import datetime
-from services.fetch_testcase import Testcase
-import requests
+from services.fetch_testcase import Testcase, _payload_dump_lock
+from services.qtest_client import get_qtest_client
+from services.testcase_context import TestcaseContext
+from services.testcase_id_cache import get_testcase_id_cache
+from services.field_metadata import get_field_metadata
 import markdown
 
 
 load_dotenv()
 
 class Updatetestcase:
-    def __init__(self, auth_headers=None):
+    def __init__(self, auth_headers=None, client=None, id_cache=None, field_metadata=None):
         self.test_case_output = {}
         self.auth_headers = auth_headers or {}
+        self.client = client or get_qtest_client()
+        self.id_cache = id_cache or get_testcase_id_cache()
+        self.field_metadata = field_metadata or get_field_metadata()
         
         # Fallback to environment variable if no headers provided
         if not self.auth_headers:
@@ -28,42 +33,28 @@ class Updatetestcase:
             # Use provided authentication headers
             self.headers = self.auth_headers
 
+    def context(self, testcase):
+        """testcase may be a TC- PID or a TestcaseContext already resolved by the caller."""
+        if isinstance(testcase, TestcaseContext):
+            return testcase
+        return TestcaseContext(self, testcase)
+
     def fetch_status_field_value(self, field_name, type):
-        with open('services\\required_automation_status.json', 'r') as file:
-            data = json.load(file)
-            if type == 1:
-                field_value = next((item["field_value"] for item in data["Automation Status"] if item["field_value_name"] == field_name), None)
-            elif type == 0:
-                field_value = next((item["field_value"] for item in data["Status"] if item["field_value_name"] == field_name), None)
-        return field_value
+        return self.field_metadata.status_value("Automation Status" if type == 1 else "Status", field_name)
 
-    
     def fetch_automation_developer(self, field_name):
-         with open('services\\api_all_fields.json', 'r') as file:
-            data = json.load(file)
-            for item in data:
-                if 'allowed_values' in item:
-                    for value in item['allowed_values']:
-                        if value['label'] == field_name and value['is_active']:
-                            return value['value']
+        if self.field_metadata.has_field("Automation Developer"):
+            return self.field_metadata.value("Automation Developer", field_name, active_only=True)
+        # Field dumps without a developer field: match the label on any field, as before
+        return self.field_metadata.value(None, field_name, active_only=True)
     
     def fetch_assigned_to(self, input_string):
 
         # input_string = input_string.replace('[', '').replace(']', '')
         names = [name.strip() for name in input_string.split(',')]   
-        # Load the api_all_fields.json file into a dictionary
-        with open('services\\api_all_fields.json', 'r') as f:
-            data = json.load(f)
-            
-            # Initialize an empty list to store the field values
-            field_values = []
-
-            # Iterate over the allowed_values list in the dictionary
-            for item in data:
-                if item['label'] == "Assigned To":
-                    for persons in item['allowed_values']:
-                        if persons['label'] in names:
-                            field_values.append(persons['value'])     
+        field_values = []
+        for name in dict.fromkeys(names):
+            field_values.extend(self.field_metadata.values("Assigned To", name))
         # Convert the list of field values to a string
         output_string = '[' + ','.join(map(str, field_values)) + ']'
        
@@ -71,8 +62,7 @@ class Updatetestcase:
                             
     def remove_attachments(self, testcase_id):
         try:
-            fetched_data = Testcase.fetch_all_testcase_fields(self,testcase_id)
-            testcaseid = fetched_data['id']
+            testcaseid = self.context(testcase_id).id
             attachments = Testcase.fetch_attachment(self,testcaseid)
             
             if not attachments:
@@ -84,7 +74,7 @@ class Updatetestcase:
             permission_error = False
             
             for attachment in attachment_ids:
-                response = requests.delete(f"https://qtest.gtie.dell.com/api/v3/projects/442/test-cases/{testcaseid}/blob-handles/{attachment}", headers=self.headers)
+                response = self.client.delete(f"test-cases/{testcaseid}/blob-handles/{attachment}", headers=self.headers)
                 if response.status_code in [200, 204]:  # 200 OK or 204 No Content are both successful
                     deleted_count += 1
                 else:
@@ -118,14 +108,22 @@ class Updatetestcase:
             "File-Name": f"{filename}",
             "expand" : "teststep"
         }
-        fetched_data = Testcase.fetch_all_testcase_fields(self,testcase_id)
-        testcaseid = fetched_data['id']
-        response = requests.post(f"https://qtest.gtie.dell.com/api/v3/projects/442/test-cases/{testcaseid}/blob-handles", headers=file_headers, data = filedata)
+        testcaseid = self.context(testcase_id).id
+        response = self.client.post(f"test-cases/{testcaseid}/blob-handles", headers=file_headers, data = filedata)
         return response.status_code
 
-    def update_test_case(self, update_dict):
-        response = requests.get(f"https://qtest.gtie.dell.com/api/v3/projects/442/test-cases/{update_dict['test_case_id']}", headers=self.headers)
-        data = response.json()
+    def update_test_case(self, update_dict, context=None):
+        """PUTs update_dict onto the test case, reusing the payload of context when the caller has one."""
+        data = (context or self.context(update_dict['test_case_id'])).data
+        self.apply_field_updates(data, update_dict)
+        id = data['id']
+        with _payload_dump_lock:
+            with open('api_single_test_case_fields.json', 'w') as f:
+                 json.dump(data, f, indent=4)
+        response = self.client.put(f"test-cases/{id}", headers=self.headers, json=data)
+        return response
+
+    def apply_field_updates(self, data, update_dict):
         for item in data['properties']:
             if item['field_name'] == "Status" and update_dict.get('test_case_status') and update_dict['test_case_status'] != "None":
                     item['field_value'] = self.fetch_status_field_value(update_dict['test_case_status'], 0)
@@ -137,16 +135,13 @@ class Updatetestcase:
                     item['field_value'] = self.fetch_assigned_to(update_dict['assigned_to']) 
             if item['field_name'] == "Automation Target Release Date" and "automation_target_release_date" in update_dict:
                     item['field_value'] = update_dict['automation_target_release_date']
-        id = data['id']
-        with open('api_single_test_case_fields.json', 'w') as f:
-             json.dump(data, f, indent=4)
-        response = requests.put(f"https://qtest.gtie.dell.com/api/v3/projects/442/test-cases/{id}", headers=self.headers, json=data)
+        return data
         
 
     def delete_test_steps(self, teststeps, id):
         try:
             for item in teststeps:
-                response = requests.delete(f"https://qtest.gtie.dell.com/api/v3/projects/442/test-cases/{id}/test-steps/{item['id']}", headers=self.headers)
+                response = self.client.delete(f"test-cases/{id}/test-steps/{item['id']}", headers=self.headers)
         except Exception as e:
             return e
         else:
@@ -164,8 +159,7 @@ class Updatetestcase:
         print(f"DEBUG: request_sample type: {type(request_sample)}")
         print(f"DEBUG: request_sample before: {request_sample}")
         
-        fetched_all_tc_fields = Testcase.fetch_all_testcase_fields(self,testcase_id)
-        id = fetched_all_tc_fields['id']  
+        id = self.context(testcase_id).id
         fetched_details = Testcase.fetch_test_steps(self, id)
         if fetched_details:
             for i, item in enumerate(fetched_details):
@@ -179,14 +173,14 @@ class Updatetestcase:
                     }
                     print(f"DEBUG: fresh_request type: {type(fresh_request)}")
                     print(f"DEBUG: fresh_request: {fresh_request}")
-                    response = requests.put(f"https://qtest.gtie.dell.com/api/v3/projects/442/test-cases/{id}/test-steps/{item['id']}", headers=self.headers, json=fresh_request)
+                    response = self.client.put(f"test-cases/{id}/test-steps/{item['id']}", headers=self.headers, json=fresh_request)
                 else:
                     # Create a fresh request for clearing
                     clear_request = {
                         "description": "",
                         "expected": ""
                     }
-                    response = requests.put(f"https://qtest.gtie.dell.com/api/v3/projects/442/test-cases/{id}/test-steps/{item['id']}", headers=self.headers, json=clear_request)
+                    response = self.client.put(f"test-cases/{id}/test-steps/{item['id']}", headers=self.headers, json=clear_request)
         else:
             data = {
                         "description": "",
@@ -199,14 +193,14 @@ class Updatetestcase:
                             }
                         ]
                     }
-            response = requests.post(f"https://qtest.gtie.dell.com/api/v3/projects/442/test-cases/{id}/test-steps", headers=self.headers, json=data)
+            response = self.client.post(f"test-cases/{id}/test-steps", headers=self.headers, json=data)
             fetched_details = Testcase.fetch_test_steps(self, id)
             for item in fetched_details:
                 fresh_request = {
                     "description": teststeps_text,
                     "expected": ""
                 }
-                response = requests.put(f"https://qtest.gtie.dell.com/api/v3/projects/442/test-cases/{id}/test-steps/{item['id']}", headers=self.headers, json=fresh_request)
+                response = self.client.put(f"test-cases/{id}/test-steps/{item['id']}", headers=self.headers, json=fresh_request)
             
          
 
@@ -0,0 +1,238 @@
+import threading
+from collections import deque
+from pyVmomi import vim, vmodl
+
+
+# Properties pulled for each managed object type in a single PropertyCollector pass.
+# Anything not listed here is never fetched during discovery.
+INVENTORY_PROPERTIES = {
+    vim.Datacenter: ['name', 'parent'],
+    vim.Folder: ['name', 'parent'],
+    vim.ComputeResource: ['name', 'parent', 'resourcePool', 'host'],
+    vim.ResourcePool: ['parent', 'vm'],
+    vim.HostSystem: ['name', 'parent', 'vm', 'runtime.inMaintenanceMode'],
+    vim.VirtualMachine: ['name', 'parent', 'guest.ipAddress', 'guest.toolsRunningStatus', 'runtime.powerState'],
+}
+
+# MoRef array properties, stored as plain lists
+LIST_PROPERTIES = ('vm', 'host')
+
+DEFAULT_PAGE_SIZE = 1000
+
+
+def inventory_property_specs():
+    return [
+        vmodl.query.PropertyCollector.PropertySpec(type=obj_type, pathSet=paths)
+        for obj_type, paths in INVENTORY_PROPERTIES.items()
+    ]
+
+
+def view_object_spec(view):
+    """ObjectSpec that walks every object listed by a ContainerView."""
+    traversal_spec = vmodl.query.PropertyCollector.TraversalSpec(
+        name='traverseView', path='view', skip=False, type=vim.view.ContainerView)
+    return vmodl.query.PropertyCollector.ObjectSpec(obj=view, skip=True, selectSet=[traversal_spec])
+
+
+class VcenterInventory:
+    """Compact in-memory table of a vCenter inventory built from PropertyCollector results."""
+
+    def __init__(self, content, page_size=DEFAULT_PAGE_SIZE):
+        self.content = content
+        self.page_size = page_size
+        self.rows = {}
+        self._children = None
+        # Property traffic: PropertyCollector calls, objects returned and property values in them
+        self.stats = {'calls': 0, 'objects': 0, 'properties': 0}
+
+    def reset_stats(self):
+        self.stats = dict.fromkeys(self.stats, 0)
+
+    def fork(self, keep_stats=False):
+        """Copy of the table that can be refreshed without touching this one; stats start at zero unless kept."""
+        inventory = VcenterInventory(self.content, self.page_size)
+        inventory.rows = {moid: dict(row) for moid, row in self.rows.items()}
+        if keep_stats:
+            inventory.stats = dict(self.stats)
+        return inventory
+
+    def load(self, root=None, cancel_event=None):
+        """Pull every inventory object below root (default: rootFolder) in paged batches."""
+        root = root or self.content.rootFolder
+        view = self.create_view(root)
+        try:
+            self._retrieve([view_object_spec(view)], cancel_event)
+        finally:
+            view.Destroy()
+        return self
+
+    def create_view(self, root):
+        return self.content.viewManager.CreateContainerView(root, list(INVENTORY_PROPERTIES), True)
+
+    def load_objects(self, objs, cancel_event=None):
+        """(Re)fetch the inventory properties of an explicit list of managed objects."""
+        objs = list(objs)
+        if objs:
+            object_specs = [vmodl.query.PropertyCollector.ObjectSpec(obj=obj, skip=False) for obj in objs]
+            self._retrieve(object_specs, cancel_event)
+        return [self.rows.get(obj._moId) for obj in objs]
+
+    def _retrieve(self, object_specs, cancel_event=None):
+        collector = self.content.propertyCollector
+        filter_spec = vmodl.query.PropertyCollector.FilterSpec(
+            objectSet=object_specs, propSet=inventory_property_specs())
+        options = vmodl.query.PropertyCollector.RetrieveOptions(maxObjects=self.page_size)
+
+        result = collector.RetrievePropertiesEx([filter_spec], options)
+        self.stats['calls'] += 1
+        while result:
+            for obj_content in result.objects:
+                self._store(obj_content)
+            if not result.token:
+                break
+            if cancel_event is not None and cancel_event.is_set():
+                collector.CancelRetrievePropertiesEx(result.token)
+                break
+            result = collector.ContinueRetrievePropertiesEx(result.token)
+            self.stats['calls'] += 1
+        self._children = None
+
+    def _store(self, obj_content):
+        obj = obj_content.obj
+        row = self.rows.setdefault(obj._moId, {'obj': obj, 'type': obj._wsdlName})
+        self.stats['objects'] += 1
+        self.stats['properties'] += len(obj_content.propSet)
+        for prop in obj_content.propSet:
+            row[prop.name] = list(prop.val) if prop.name in LIST_PROPERTIES else prop.val
+
+    def apply_update(self, object_update):
+        """Fold a WaitForUpdatesEx ObjectUpdate into the table."""
+        obj = object_update.obj
+        if object_update.kind == 'leave':
+            self.rows.pop(obj._moId, None)
+        else:
+            row = self.rows.setdefault(obj._moId, {'obj': obj, 'type': obj._wsdlName})
+            self.stats['objects'] += 1
+            self.stats['properties'] += len(object_update.changeSet)
+            for change in object_update.changeSet:
+                if change.op in ('remove', 'indirectRemove'):
+                    row.pop(change.name, None)
+                else:
+                    row[change.name] = list(change.val) if change.name in LIST_PROPERTIES else change.val
+        self._children = None
+
+    def get(self, obj):
+        return self.rows.get(obj._moId) if obj is not None else None
+
+    def name(self, obj, default=None):
+        row = self.get(obj)
+        return row.get('name', default) if row else default
+
+    def value(self, obj, path, default=None):
+        row = self.get(obj)
+        return row.get(path, default) if row else default
+
+    def children(self, obj):
+        if self._children is None:
+            self._children = {}
+            for row in self.rows.values():
+                parent = row.get('parent')
+                if parent is not None:
+                    self._children.setdefault(parent._moId, []).append(row)
+        return self._children.get(obj._moId, [])
+
+    def descendants(self, obj):
+        """Rows below obj in the inventory tree, breadth first."""
+        found = []
+        queue = deque(self.children(obj))
+        while queue:
+            row = queue.popleft()
+            found.append(row)
+            queue.extend(self.children(row['obj']))
+        return found
+
+    def folders_matching(self, system_name):
+        """Folder rows whose name contains system_name, in inventory order."""
+        for row in self.rows.values():
+            if row['type'] == 'Folder' and system_name in row.get('name', ''):
+                yield row
+
+    def hosts_and_vms(self, folder):
+        """Compute resources, hosts and VMs living anywhere below folder."""
+        hosts = set()
+        vms = set()
+        for row in self.descendants(folder):
+            if row['type'] in ('ComputeResource', 'ClusterComputeResource', 'HostSystem'):
+                hosts.add(row['obj'])
+            elif row['type'] == 'VirtualMachine':
+                vms.add(row['obj'])
+        vms.update(self.vms_of(hosts))
+
+        # VMs reached through a resource pool usually live in a separate VM folder tree
+        missing = [vm for vm in vms if vm._moId not in self.rows]
+        if missing:
+            self.load_objects(missing)
+        return hosts, vms
+
+    def vms_of(self, hosts):
+        """VMs in the root resource pool of compute resources, or registered on hosts."""
+        vms = set()
+        for host in hosts:
+            row = self.get(host) or {}
+            if row.get('type') == 'HostSystem':
+                vms.update(row.get('vm', []))
+            else:
+                vms.update(self.value(row.get('resourcePool'), 'vm', []))
+        return vms
+
+    def host_systems(self, hosts):
+        """HostSystems behind a mix of compute resources and hosts, keyed by MoRef id."""
+        host_systems = {}
+        for host in hosts:
+            row = self.get(host) or {}
+            if row.get('type') == 'HostSystem':
+                host_systems[host._moId] = host
+            else:
+                for child in row.get('host', []):
+                    host_systems[child._moId] = child
+
+        missing = [host for host in host_systems.values() if host._moId not in self.rows]
+        if missing:
+            self.load_objects(missing)
+        return host_systems
+
+    def compute_resources_with_vm_name(self, system_name):
+        """Compute resources owning at least one VM whose name contains system_name."""
+        hosts = set()
+        vms = set()
+        for row in self.rows.values():
+            if row['type'] not in ('ComputeResource', 'ClusterComputeResource'):
+                continue
+            pool_vms = self.value(row.get('resourcePool'), 'vm', [])
+            if any(system_name in self.name(vm, '') for vm in pool_vms):
+                hosts.add(row['obj'])
+                vms.update(pool_vms)
+        return hosts, vms
+
+
+class SharedInventories:
+    """
+    Inventories loaded once per vCenter content and shared by the runs of a batch.
+
+    The first run asking for a vCenter loads it while the others wait; every run
+    gets its own fork, since runs refresh rows (power states, missing VMs) on
+    their own threads. Only the run that paid for the load sees its stats.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}   # id(content) -> {'content', 'lock', 'inventory'}
+
+    def get(self, content):
+        with self.lock:
+            entry = self.entries.setdefault(id(content), {'content': content, 'lock': threading.Lock(), 'inventory': None})
+        with entry['lock']:
+            if entry['inventory'] is None:
+                entry['inventory'] = VcenterInventory(content).load()
+                return entry['inventory'].fork(keep_stats=True)
+        return entry['inventory'].fork()
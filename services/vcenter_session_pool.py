@@ -0,0 +1,111 @@
+import atexit
+import logging
+import ssl
+import threading
+import time
+from collections import OrderedDict
+from pyVim.connect import SmartConnect, Disconnect
+
+
+class VcenterSessionPool:
+    """Process-wide pool of logged-in vCenter sessions keyed by (server, username)."""
+
+    def __init__(self, max_sessions=8, keepalive_interval=300, validate_after=60):
+        self.max_sessions = max_sessions
+        self.keepalive_interval = keepalive_interval
+        self.validate_after = validate_after
+        self.sessions = OrderedDict()   # (server, username) -> {'si': ..., 'checked_at': ...}
+        self.lock = threading.Lock()
+        self.key_locks = {}
+        self.stop_event = threading.Event()
+
+        self.keepalive_thread = threading.Thread(target=self._keepalive_loop, name="vcenter-keepalive", daemon=True)
+        self.keepalive_thread.start()
+        atexit.register(self.close_all)
+
+    def _key_lock(self, key):
+        with self.lock:
+            return self.key_locks.setdefault(key, threading.Lock())
+
+    def get(self, server, username, password):
+        """Returns a live session for server/username, logging in only when needed."""
+        key = (server, username)
+        with self._key_lock(key):
+            with self.lock:
+                session = self.sessions.get(key)
+                if session is not None:
+                    self.sessions.move_to_end(key)
+
+            if session is not None:
+                if time.time() - session['checked_at'] < self.validate_after or self.is_valid(session['si']):
+                    session['checked_at'] = time.time()
+                    return session['si']
+                logging.info(f"vCenter session for {username}@{server} expired, logging in again")
+                self.evict(key)
+
+            context = ssl._create_unverified_context()
+            si = SmartConnect(host=server, user=username, pwd=password, sslContext=context)
+            with self.lock:
+                self.sessions[key] = {'si': si, 'checked_at': time.time()}
+                overflow = []
+                while len(self.sessions) > self.max_sessions:
+                    overflow.append(self.sessions.popitem(last=False))
+            for (old_server, old_username), old_session in overflow:
+                logging.info(f"Evicting vCenter session for {old_username}@{old_server}")
+                self.logout(old_session['si'])
+            return si
+
+    def is_valid(self, si):
+        try:
+            return si.content.sessionManager.currentSession is not None
+        except Exception:
+            return False
+
+    def evict(self, key, expected=None):
+        """Logs out the session under key; with expected, only if that is still the pooled session."""
+        with self.lock:
+            if expected is not None and self.sessions.get(key) is not expected:
+                return
+            session = self.sessions.pop(key, None)
+        if session is not None:
+            self.logout(session['si'])
+
+    def logout(self, si):
+        try:
+            Disconnect(si)
+        except Exception as e:
+            logging.info(f"Error while logging out of vCenter session: {e}")
+
+    def _keepalive_loop(self):
+        while not self.stop_event.wait(self.keepalive_interval):
+            with self.lock:
+                sessions = list(self.sessions.items())
+            for key, session in sessions:
+                try:
+                    session['si'].CurrentTime()
+                    session['checked_at'] = time.time()
+                except Exception as e:
+                    logging.info(f"Keepalive failed for vCenter session {key[1]}@{key[0]}: {e}")
+                    # get() may have logged in again while CurrentTime was failing; leave that session alone
+                    self.evict(key, expected=session)
+
+    def close_all(self):
+        self.stop_event.set()
+        with self.lock:
+            sessions = list(self.sessions.values())
+            self.sessions.clear()
+        for session in sessions:
+            self.logout(session['si'])
+
+
+_session_pool = None
+_session_pool_lock = threading.Lock()
+
+
+def get_session_pool():
+    """Shared pool for callers outside Streamlit (the Streamlit page caches its own with st.cache_resource)."""
+    global _session_pool
+    with _session_pool_lock:
+        if _session_pool is None:
+            _session_pool = VcenterSessionPool()
+        return _session_pool
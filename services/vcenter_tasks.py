@@ -0,0 +1,135 @@
+import math
+import time
+from pyVmomi import vim, vmodl
+
+
+FINISHED_STATES = (vim.TaskInfo.State.success, vim.TaskInfo.State.error)
+
+
+class TaskWaiter:
+    """
+    Waits for vCenter tasks through a private PropertyCollector.
+
+    Every task gets a filter on info.state/info.error and the waiter blocks in
+    WaitForUpdatesEx, so it wakes up as soon as any of them finishes instead of
+    polling task.info on a fixed interval.
+    """
+
+    def __init__(self, content):
+        self.collector = content.propertyCollector.CreatePropertyCollector()
+        self.version = ''
+        self.pending = {}
+
+    def add(self, task):
+        filter_spec = vmodl.query.PropertyCollector.FilterSpec(
+            objectSet=[vmodl.query.PropertyCollector.ObjectSpec(obj=task, skip=False)],
+            propSet=[vmodl.query.PropertyCollector.PropertySpec(type=vim.Task, pathSet=['info.state', 'info.error'])])
+        property_filter = self.collector.CreateFilter(filter_spec, partialUpdates=True)
+        self.pending[task._moId] = {'task': task, 'filter': property_filter, 'state': None, 'error': None}
+
+    def discard(self, task):
+        """Stops waiting for task; it keeps running on vCenter."""
+        entry = self.pending.pop(task._moId, None)
+        if entry is not None:
+            entry['filter'].DestroyPropertyFilter()
+
+    def wait_any(self, timeout=None):
+        """Blocks until at least one pending task finishes; returns the finished results (empty on timeout)."""
+        deadline = time.time() + timeout if timeout is not None else None
+        finished = []
+        while self.pending and not finished:
+            wait_seconds = 60
+            if deadline is not None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                wait_seconds = min(wait_seconds, max(1, math.ceil(remaining)))
+
+            options = vmodl.query.PropertyCollector.WaitOptions(maxWaitSeconds=wait_seconds)
+            update_set = self.collector.WaitForUpdatesEx(self.version, options)
+            if update_set is None:
+                continue
+            self.version = update_set.version
+            for filter_update in update_set.filterSet:
+                for object_update in filter_update.objectSet:
+                    entry = self.pending.get(object_update.obj._moId)
+                    if entry is None:
+                        continue
+                    for change in object_update.changeSet:
+                        if change.name == 'info.state':
+                            entry['state'] = change.val
+                        elif change.name == 'info.error':
+                            entry['error'] = change.val
+                    if entry['state'] in FINISHED_STATES:
+                        finished.append(entry)
+
+        for entry in finished:
+            del self.pending[entry['task']._moId]
+            entry['filter'].DestroyPropertyFilter()
+        return [{'task': entry['task'], 'state': entry['state'], 'error': entry['error']} for entry in finished]
+
+    def wait(self, tasks, timeout=None):
+        """Waits for all tasks; returns results keyed by task MoRef id. Unfinished tasks report state 'timeout'."""
+        for task in tasks:
+            self.add(task)
+        deadline = time.time() + timeout if timeout is not None else None
+        results = {}
+        while self.pending:
+            remaining = deadline - time.time() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                break
+            for result in self.wait_any(remaining):
+                results[result['task']._moId] = result
+        for moid, entry in self.pending.items():
+            results[moid] = {'task': entry['task'], 'state': 'timeout', 'error': None}
+        return results
+
+    def close(self):
+        try:
+            self.collector.DestroyPropertyCollector()
+        except Exception:
+            pass
+
+
+def task_error_message(error):
+    return getattr(error, 'msg', None) or str(error)
+
+
+def wait_for_property(content, obj, path, predicate, timeout):
+    """
+    Blocks until predicate(obj.<path>) holds or timeout seconds pass.
+
+    Uses WaitForUpdatesEx on a private PropertyCollector, so the caller wakes
+    up on the change itself. Returns (matched, last_value).
+    """
+    collector = content.propertyCollector.CreatePropertyCollector()
+    try:
+        filter_spec = vmodl.query.PropertyCollector.FilterSpec(
+            objectSet=[vmodl.query.PropertyCollector.ObjectSpec(obj=obj, skip=False)],
+            propSet=[vmodl.query.PropertyCollector.PropertySpec(type=type(obj), pathSet=[path])])
+        collector.CreateFilter(filter_spec, partialUpdates=True)
+
+        deadline = time.time() + timeout
+        version = ''
+        value = None
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False, value
+            options = vmodl.query.PropertyCollector.WaitOptions(maxWaitSeconds=min(60, max(1, math.ceil(remaining))))
+            update_set = collector.WaitForUpdatesEx(version, options)
+            if update_set is None:
+                continue
+            version = update_set.version
+            for filter_update in update_set.filterSet:
+                for object_update in filter_update.objectSet:
+                    for change in object_update.changeSet:
+                        if change.name == path:
+                            value = change.val
+            if predicate(value):
+                return True, value
+    finally:
+        try:
+            collector.DestroyPropertyCollector()
+        except Exception:
+            pass
@@ -0,0 +1,120 @@
+import logging
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+TOOLS_RUNNING = 'guestToolsRunning'
+
+
+class VmReadinessProber:
+    """
+    Waits for a set of VMs to accept SSH connections, probing all of them at once.
+
+    Every round refreshes guest.toolsRunningStatus / guest.ipAddress for the VMs still
+    pending in one PropertyCollector call, then tries a TCP connect to the SSH port of
+    each one in parallel. The delay between rounds doubles up to max_delay and drops
+    back to initial_delay whenever VMware Tools comes up on a pending VM, since the
+    console usually follows shortly after.
+
+    VMs without an IP get a short grace period only: they are given up as 'no_ip'
+    after no_ip_rounds rounds, or sooner once Tools has been running for
+    tools_ip_rounds rounds and still reports no address, so one VM without Tools
+    or a NIC does not hold the rest of the run until the overall timeout.
+    """
+
+    def __init__(self, inventory, port=22, timeout=4000, initial_delay=2, max_delay=60,
+                 connect_timeout=3, max_workers=32, thread_name_prefix="vm-readiness", no_ip_rounds=5,
+                 tools_ip_rounds=2):
+        self.inventory = inventory
+        self.port = port
+        self.timeout = timeout
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.connect_timeout = connect_timeout
+        self.max_workers = max_workers
+        self.thread_name_prefix = thread_name_prefix
+        self.no_ip_rounds = no_ip_rounds
+        self.tools_ip_rounds = tools_ip_rounds
+
+    def probe(self, address):
+        try:
+            with socket.create_connection((address, self.port), timeout=self.connect_timeout):
+                return True
+        except OSError:
+            return False
+
+    def wait(self, vm_details, cancel_event=None):
+        """
+        vm_details is the get_vm_ip list; IPs learnt while waiting are written back into it.
+        Returns one report entry per VM with state 'ready', 'no_ip', 'timeout' or 'cancelled'.
+        """
+        start_time = time.time()
+        deadline = start_time + self.timeout
+        pending = {item['vm']._moId: item for item in vm_details}
+        tools_running = set()
+        no_ip_rounds = {}        # moid -> rounds seen without an IP
+        tools_no_ip_rounds = {}  # moid -> of those, rounds with Tools running
+        report = {}
+        delay = self.initial_delay
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(pending))),
+                                thread_name_prefix=self.thread_name_prefix) as executor:
+            while pending:
+                self.inventory.load_objects([item['vm'] for item in pending.values()])
+                for moid, item in pending.items():
+                    ip = self.inventory.value(item['vm'], 'guest.ipAddress')
+                    if ip:
+                        item['vm_ip'] = ip
+                    if self.inventory.value(item['vm'], 'guest.toolsRunningStatus') == TOOLS_RUNNING \
+                            and moid not in tools_running:
+                        tools_running.add(moid)
+                        delay = self.initial_delay
+                    if not item['vm_ip']:
+                        no_ip_rounds[moid] = no_ip_rounds.get(moid, 0) + 1
+                        if moid in tools_running:
+                            tools_no_ip_rounds[moid] = tools_no_ip_rounds.get(moid, 0) + 1
+
+                for moid in [moid for moid, item in pending.items() if not item['vm_ip']]:
+                    if no_ip_rounds[moid] >= self.no_ip_rounds or tools_no_ip_rounds.get(moid, 0) >= self.tools_ip_rounds:
+                        item = pending.pop(moid)
+                        logging.info(f" Ip not available for host {self.inventory.name(item['vm'], moid)}")
+                        report[moid] = self._entry(item, 'no_ip', start_time)
+
+                probed = [item for item in pending.values() if item['vm_ip']]
+                for item, ready in zip(probed, executor.map(lambda item: self.probe(item['vm_ip']), probed)):
+                    if ready:
+                        name = self.inventory.name(item['vm'], item['vm']._moId)
+                        logging.info(f"VM {name} is ready")
+                        report[item['vm']._moId] = self._entry(item, 'ready', start_time)
+                        del pending[item['vm']._moId]
+
+                if not pending:
+                    break
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                if cancel_event is not None:
+                    if cancel_event.wait(min(delay, remaining)):
+                        break
+                else:
+                    time.sleep(min(delay, remaining))
+                delay = min(delay * 2, self.max_delay)
+
+        state = 'cancelled' if cancel_event is not None and cancel_event.is_set() else 'timeout'
+        for moid, item in pending.items():
+            name = self.inventory.name(item['vm'], moid)
+            if item['vm_ip']:
+                logging.info(f"VM {name} is Not Yet ready")
+            else:
+                logging.info(f" Ip not available for host {name}")
+            report[moid] = self._entry(item, state, start_time)
+        return [report[item['vm']._moId] for item in vm_details]
+
+    def _entry(self, item, state, start_time):
+        return {
+            'vm': self.inventory.name(item['vm'], item['vm']._moId),
+            'vm_ip': item['vm_ip'],
+            'state': state,
+            'duration': round(time.time() - start_time, 1),
+        }
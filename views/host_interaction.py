@@ -1,13 +1,41 @@
 import streamlit as st
 import os
 from datetime import datetime
+from functools import partial
 from services.host_management import HostManagement
+from services.vcenter_session_pool import VcenterSessionPool
+from services.job_runner import JobRunner
+from services.box_scheduler import BoxScheduler
 from services.handling_log import *
 from services.log_cleanup import get_cleanup_warning
 from components.log_viewer import create_log_viewer
 
 st.set_page_config(layout="wide")
 
+
+@st.cache_resource
+def get_job_runner():
+    """Background runner shared by every session, so jobs outlive the tab that started them."""
+    return JobRunner()
+
+
+@st.cache_resource
+def get_vcenter_session_pool():
+    """vCenter sessions shared by every rerun and every operator of this server."""
+    return VcenterSessionPool()
+
+
+def run_host_management(host_management_dict, ready_concurrency, progress):
+    hm = HostManagement(session_pool=get_vcenter_session_pool(), ready_concurrency=ready_concurrency)
+    return hm.main(host_management_dict, progress)
+
+
+def run_box_batch(box_names, host_management_dict, ready_concurrency, max_parallel, per_vcenter, progress):
+    make_host_management = partial(HostManagement, session_pool=get_vcenter_session_pool(), ready_concurrency=ready_concurrency)
+    scheduler = BoxScheduler(make_host_management, max_parallel=max_parallel, per_vcenter=per_vcenter)
+    return scheduler.run(box_names, host_management_dict, progress)
+
+
 # Centered single column form
 col1, col2, col3 = st.columns([1, 2, 1])
 
@@ -15,7 +43,8 @@ with col2:
     with st.form("Box Configuration"):
         st.subheader("Host Configuration")
         
-        boxname = st.text_input("Box Name", help="Enter the name of the box/host")
+        boxname = st.text_input("Box Name", help="Enter the name of the box/host, or several separated by commas for a batch run")
+        box_names = [name.strip() for name in boxname.replace("\n", ",").split(",") if name.strip()]
         
         # Reboot options in a compact row
         st.write("**Reboot Options:**")
@@ -24,6 +53,12 @@ with col2:
             esx_reboot = st.radio("ESX", ["Yes", "No"], index=1, key="esx_reboot")
         with reboot_col2:
             vm_reboot = st.radio("VM", ["Yes", "No"], index=1, key="vm_reboot")
+        esx_batch_size = st.number_input("ESX hosts rebooted in parallel", min_value=1, max_value=16, value=1,
+                                         help="Hosts cycled through maintenance, reboot and reconnect at the same time")
+        force_refresh = st.checkbox("Force fresh discovery",
+                                    help="Ignore hosts and VMs remembered from a run on this box in the last 15 minutes")
+        resume = st.checkbox("Resume unfinished run", value=True,
+                             help="Skip the stages and hosts an interrupted or failed run of the same request already completed")
         
         hostname = st.text_input("ACLX Hostname (SOS VTOC)", help="Hostname containing ACLX DB script")
         script_name = st.text_input("Script Path (SOS VTOC)", help="Full path to script (e.g., /root/setup.sh)")
@@ -37,6 +72,17 @@ with col2:
             updateadios = st.radio("Update", ["Yes", "No"], index=1, key="updateadios")
         with adios_col2:
             ready_host = st.radio("Ready", ["Yes", "No"], index=0, key="ready_host")
+        ready_concurrency = st.number_input("Hosts readied in parallel", min_value=1, max_value=64, value=8,
+                                            help="Upper bound on VMs configured over SSH at the same time")
+        
+        st.write("**Batch Options:**")
+        batch_col1, batch_col2 = st.columns(2)
+        with batch_col1:
+            max_parallel_boxes = st.number_input("Boxes in parallel", min_value=1, max_value=32, value=4,
+                                                 help="Boxes processed at the same time in a batch run")
+        with batch_col2:
+            boxes_per_vcenter = st.number_input("Boxes per vCenter", min_value=1, max_value=16, value=2,
+                                                help="Boxes running operations against the same vCenter at the same time")
         
         # Submit button with better styling
         submit = st.form_submit_button("🚀 Start Host Management", use_container_width=True)
@@ -45,12 +91,16 @@ log_placeholder = st.empty()
 
 if submit:
     host_management_dict = {}
-    if not boxname:
+    if not box_names:
         st.error("⚠️ Please enter the box name")
     else:
-        host_management_dict['system'] = boxname
+        host_management_dict['system'] = box_names[0]
         host_management_dict['esx_reboot'] = esx_reboot 
         host_management_dict['vm_reboot'] = vm_reboot
+        host_management_dict['esx_batch_size'] = int(esx_batch_size)
+        if force_refresh:
+            host_management_dict['force_refresh'] = True
+        host_management_dict['resume'] = resume
         if hostname and script_name:
             host_management_dict['hostname'] = hostname
             host_management_dict['script_name'] = script_name
@@ -64,12 +114,17 @@ if submit:
         with st.expander("📋 Configuration Summary", expanded=True):
             st.json(host_management_dict)
         
-        # Execute host management
-        with st.spinner("🔄 Executing host management..."):
-            hm = HostManagement()
-            hm.main(host_management_dict)
-        
-        st.success("✅ Host management operation completed!")
+        # Run host management in the background; the job table below follows its progress
+        if len(box_names) > 1:
+            job = partial(run_box_batch, box_names, dict(host_management_dict), int(ready_concurrency),
+                          int(max_parallel_boxes), int(boxes_per_vcenter))
+            job_params = dict(host_management_dict, system=box_names)
+        else:
+            job = partial(run_host_management, dict(host_management_dict), int(ready_concurrency))
+            job_params = host_management_dict
+        job_id = get_job_runner().submit(", ".join(name.upper() for name in box_names), job_params, job)
+        st.session_state.setdefault('host_jobs', []).insert(0, job_id)
+        st.success(f"✅ Host management job {job_id} submitted for {', '.join(box_names)}")
 
         # Display cleanup warning after operations
         warning_message, cleanup_stats = get_cleanup_warning()
@@ -98,28 +153,71 @@ if submit:
                     st.session_state['cleanup_snoozed'] = True
                     st.rerun()
 
+
+
+@st.fragment(run_every=5)
+def show_host_jobs():
+    """Status of the jobs started from this browser session, refreshed every few seconds."""
+    job_ids = st.session_state.get('host_jobs', [])
+    if not job_ids:
+        return
+
+    st.subheader("🛠️ Host Management Jobs")
+    runner = get_job_runner()
+    for job_id in job_ids:
+        job = runner.get(job_id)
+        if job is None:
+            continue
+        status_icon = {'queued': '⏳', 'running': '🔄', 'completed': '✅', 'failed': '❌', 'interrupted': '⚠️'}
+        with st.expander(f"{status_icon.get(job['status'], '')} {job['box_name']} — {job['status']} ({job_id})",
+                         expanded=job['status'] in ('queued', 'running')):
+            st.text(f"Submitted: {job['submitted_at']}    Finished: {job['finished_at'] or '-'}")
+            if job['progress']:
+                st.text(f"Progress: {job['progress']}")
+            if job['error']:
+                st.code(job['error'])
+            run_report = job['result'] or {}
+            if 'boxes' in run_report:
+                st.write(f"**Batch:** {run_report['total']} boxes, {len(run_report['failed'])} failed, "
+                         f"{run_report['duration']} s")
+                st.dataframe([
+                    {'box': box, 'vcenter': report.get('vcenter'), 'error': report.get('error'),
+                     'hosts ready': sum(1 for entry in report.get('ready_hosts', []) if entry['result'] == 'success'),
+                     'hosts': len(report.get('ready_hosts', []))}
+                    for box, report in run_report['boxes'].items()
+                ], use_container_width=True)
+            elif run_report.get('ready_hosts'):
+                st.write("**Host Readiness:**")
+                st.dataframe(run_report['ready_hosts'], use_container_width=True)
+
+
+show_host_jobs()
+
 # Compact Log Viewer Section
 st.divider()
 st.subheader("📋 Live Logs")
 
+# Batch runs write one log per box; follow the first one
+log_box = box_names[0] if box_names else None
+
 # Use expander for log viewer to save space
 with st.expander(" Live Log Viewer", expanded=boxname is not None):
     # Get the latest log file for the current box if available
     latest_log = get_latest_log()
-    if latest_log and boxname:
+    if latest_log and log_box:
         # Try to find log file for the specific box
         log_dir = "Logs"
         box_logs = []
         for f in os.listdir(log_dir):
-            if f.endswith(".log") and boxname in f:
+            if f.endswith(".log") and log_box in f:
                 box_logs.append(os.path.join(log_dir, f))
         
         if box_logs:
             box_log_path = max(box_logs, key=os.path.getmtime)
-            st.info(f"📡 Live logs for **{boxname}**")
+            st.info(f"📡 Live logs for **{log_box}**")
             create_log_viewer(box_log_path, key="host_live")
         else:
-            st.info(f"No logs found for {boxname}. Showing latest available log.")
+            st.info(f"No logs found for {log_box}. Showing latest available log.")
             create_log_viewer(latest_log, key="general_live")
     else:
         st.info("🔍 Start a host management operation to see live logs:")
@@ -2,7 +2,7 @@ import streamlit as st
 from streamlit_quill import st_quill
 import numpy as np
 from services.fetch_testcase import Testcase
-from services.update_test_case import Updatetestcase
+from services.bulk_testcase_update import BulkTestcaseUpdate, normalize_testcase_ids
 from services.notification_utils import NotificationManager
 from services.auth_service import get_auth_service
 import time
@@ -38,6 +38,18 @@ with col1:
         with form_c2:
             update = st.form_submit_button("Update")
 
+    with st.expander("Pre-load test case IDs"):
+        prewarm_query = st.text_input("qTest search query",
+                                      help="Test cases matching this qTest search (e.g. a module or release) get their "
+                                           "IDs cached, so later updates skip the lookup")
+        if st.button("Pre-load") and prewarm_query.strip():
+            with st.spinner("Searching qTest ...."):
+                try:
+                    cached = Testcase(auth_headers).prewarm_id_cache(prewarm_query.strip())
+                    st.success(f"✅ Cached the IDs of {cached} test case(s)")
+                except Exception as e:
+                    st.error(f"❌ Search failed: {e}")
+
 with col2:
     if fetch:
         with st.spinner("Processing the fetch request...."):
@@ -88,181 +100,134 @@ with col2:
                     st.markdown(f"""<div>{step['description']}</div>""", unsafe_allow_html= True)
 
     if update:
-        testcase = Updatetestcase(auth_headers)
         notifications = []
+        testcase_ids = normalize_testcase_ids(testcase_id)
         
-        # Get current test case data for comparison
-        current_data = {}
-        if testcase_id:
-            for item in testcase_id.split(','):
-                tc = item.strip()
-                if not tc.startswith("TC-"):
-                    tc = "TC-" + tc
-                try:
-                    current_data[tc] = testcase.fetch_required_testcase_fields(tc)[0]
-                except:
-                    current_data[tc] = {}
-        
-        update_dict = {}
-        if not testcase_id:
+        if not testcase_ids:
             st.error("Please enter the test case id")
         else:
-            for item in testcase_id.split(','):
-                tc = item.strip()
-                if not tc.startswith("TC-"):
-                    tc = "TC-" + tc
-                with st.spinner("Updating the test case ...."):
-                    update_dict['test_case_id'] = tc
-                    
-                    # Track field changes and create notifications
-                    current_fields = current_data.get(tc, {})
-                    
-                    if testcase_status is not None and testcase_status != "None":
-                        old_status = current_fields.get('test_case_status', 'None')
-                        if old_status != testcase_status:
-                            update_dict['test_case_status'] = testcase_status
+            # Requested values; each test case only gets the ones that differ from what it has
+            changes = {}
+            if testcase_status is not None and testcase_status != "None":
+                changes['test_case_status'] = testcase_status
+            if testcase_automation_status is not None and testcase_automation_status != "None":
+                changes['automation_status'] = testcase_automation_status
+            if testcase_automation_developer and testcase_automation_developer.strip():
+                changes['testcase_automation_developer'] = testcase_automation_developer
+            if testcase_assignee and testcase_assignee.strip():
+                changes['assigned_to'] = testcase_assignee
+            datetime_string = selected_date.strftime("%Y-%m-%d")
+            if datetime_string != "2022-01-01":
+                date_object = datetime.datetime.strptime(datetime_string, "%Y-%m-%d")
+                changes['automation_target_release_date'] = date_object.isoformat() + "+00:00"
+            
+            attachment = None
+            if not remove_attachment and uploaded_file is not None:
+                attachment = (uploaded_file.name, uploaded_file.read())
+            
+            steps_text = None
+            if testcase_steps:
+                # Extract text content from Quill editor output
+                if isinstance(testcase_steps, dict):
+                    # Quill editor returns a dict, extract the text/html content
+                    steps_text = testcase_steps.get('html', '') or testcase_steps.get('text', '') or str(testcase_steps)
+                else:
+                    # If it's already a string, use it directly
+                    steps_text = str(testcase_steps)
+            
+            with st.spinner(f"Updating {len(testcase_ids)} test case(s) ...."):
+                results = BulkTestcaseUpdate(auth_headers).run(
+                    testcase_ids, changes, remove_attachment, attachment, steps_text)
+            
+            # Everything below runs on the main thread, from the collected results
+            for result in results:
+                tc = result['test_case']
+                if result['error']:
+                    st.error(f"❌ {tc}: {result['error']}")
+                    continue
+                
+                for label, old_value, new_value in result['fields']:
+                    notifications.append(
+                        NotificationManager.create_field_update_notification(label, old_value, new_value, tc)
+                    )
+                
+                attachment_result = result['attachments']
+                if remove_attachment and attachment_result is not None:
+                    if attachment_result['success']:
+                        if attachment_result['deleted_count'] > 0:
                             notifications.append(
-                                NotificationManager.create_field_update_notification(
-                                    "Test Case Status", old_status, testcase_status, tc
+                                NotificationManager.create_attachment_notification(
+                                    "remove", "", "success", f"Deleted {attachment_result['deleted_count']} attachments"
                                 )
                             )
-                    
-                    if testcase_automation_status is not None and testcase_automation_status != "None":
-                        old_automation = current_fields.get('automation_status', 'None')
-                        if old_automation != testcase_automation_status:
-                            update_dict['automation_status'] = testcase_automation_status
+                            st.success(f"✅ {tc}: {attachment_result['message']}")
+                        else:
                             notifications.append(
-                                NotificationManager.create_field_update_notification(
-                                    "Automation Status", old_automation, testcase_automation_status, tc
+                                NotificationManager.create_attachment_notification(
+                                    "remove", "", "info", "No attachments to remove"
                                 )
                             )
-                    
-                    if testcase_automation_developer and testcase_automation_developer.strip():
-                        old_developer = current_fields.get('automation_developer', '')
-                        if old_developer != testcase_automation_developer:
-                            update_dict['testcase_automation_developer'] = testcase_automation_developer
+                            st.info(f"ℹ️ {tc}: {attachment_result['message']}")
+                    else:
+                        if attachment_result.get('permission_error', False):
+                            st.error("❌ Permission Denied: The API token does not have permission to delete attachments.")
+                            st.warning("🔧 **Solution**: Please contact your qTest administrator to grant attachment deletion permissions to your API token.")
+                            st.info("📋 **Current token permissions**: Read and update test cases only")
+                            st.info("🔑 **Required permission**: Attachment deletion (blob-handles DELETE)")
                             notifications.append(
-                                NotificationManager.create_field_update_notification(
-                                    "Automation Developer", old_developer, testcase_automation_developer, tc
+                                NotificationManager.create_attachment_notification(
+                                    "remove", "", "error", "Permission denied"
                                 )
                             )
-                    
-                    if testcase_assignee and testcase_assignee.strip():
-                        old_assignee = current_fields.get('assigned_to_value', '').strip("[]")
-                        if old_assignee != testcase_assignee:
-                            update_dict['assigned_to'] = testcase_assignee
+                        else:
+                            st.error(f"❌ {tc}: {attachment_result['message']}")
                             notifications.append(
-                                NotificationManager.create_field_update_notification(
-                                    "Assigned To", old_assignee, testcase_assignee, tc
+                                NotificationManager.create_attachment_notification(
+                                    "remove", "", "error", attachment_result['message']
                                 )
                             )
-                    
-                    datetime_string = selected_date.strftime("%Y-%m-%d")
-                    if datetime_string != "2022-01-01":
-                        date_object = datetime.datetime.strptime(datetime_string, "%Y-%m-%d")
-                        output_string = date_object.isoformat() + "+00:00"
-                        old_date = current_fields.get('automation_release_date', '')
-                        if old_date != output_string:
-                            update_dict['automation_target_release_date'] = output_string
-                            notifications.append(
-                                NotificationManager.create_field_update_notification(
-                                    "Target Release Date", old_date.split("T")[0] if old_date else 'None', 
-                                    datetime_string, tc
-                                )
+                elif attachment_result is not None:
+                    file_name = attachment_result['file_name']
+                    file_upload_response = attachment_result['status_code']
+                    if file_upload_response in [200, 201]:  # 200 OK or 201 Created are both successful
+                        st.success(f"✅ {tc}: Attachment '{file_name}' uploaded successfully (Status: {file_upload_response})")
+                        notifications.append(
+                            NotificationManager.create_attachment_notification(
+                                "upload", file_name, "success", "File uploaded successfully"
                             )
-                    
-                    # Update test case fields first
-                    if update_dict:
-                        testcase.update_test_case(update_dict)
-
-                    # Handle attachment operations
-                    attachment_result = None
-                    if remove_attachment:
-                        with st.spinner("Removing attachments...."):
-                            attachment_result = testcase.remove_attachments(tc)
-                        if attachment_result['success']:
-                            if attachment_result['deleted_count'] > 0:
-                                notifications.append(
-                                    NotificationManager.create_attachment_notification(
-                                        "remove", "", "success", f"Deleted {attachment_result['deleted_count']} attachments"
-                                    )
-                                )
-                                st.success(f"✅ {attachment_result['message']}")
-                            else:
-                                notifications.append(
-                                    NotificationManager.create_attachment_notification(
-                                        "remove", "", "info", "No attachments to remove"
-                                    )
-                                )
-                                st.info(f"ℹ️ {attachment_result['message']}")
-                        else:
-                            if attachment_result.get('permission_error', False):
-                                st.error("❌ Permission Denied: The API token does not have permission to delete attachments.")
-                                st.warning("🔧 **Solution**: Please contact your qTest administrator to grant attachment deletion permissions to your API token.")
-                                st.info("📋 **Current token permissions**: Read and update test cases only")
-                                st.info("🔑 **Required permission**: Attachment deletion (blob-handles DELETE)")
-                                notifications.append(
-                                    NotificationManager.create_attachment_notification(
-                                        "remove", "", "error", "Permission denied"
-                                    )
-                                )
-                            else:
-                                st.error(f"❌ {attachment_result['message']}")
-                                notifications.append(
-                                    NotificationManager.create_attachment_notification(
-                                        "remove", "", "error", attachment_result['message']
-                                    )
-                                )
-                    elif uploaded_file is not None:
-                        with st.spinner("Uploading attachment...."):
-                            file_name = uploaded_file.name
-                            file_data = uploaded_file.read()
-                            
-                            # Upload the main file
-                            file_upload_response = testcase.update_attachments(tc, file_name, file_data)
-                            if file_upload_response in [200, 201]:  # 200 OK or 201 Created are both successful
-                                st.success(f"✅ Attachment '{file_name}' uploaded successfully (Status: {file_upload_response})")
-                                notifications.append(
-                                    NotificationManager.create_attachment_notification(
-                                        "upload", file_name, "success", "File uploaded successfully"
-                                    )
-                                )
-                            else:
-                                st.error(f"❌ Failed to upload attachment (Status: {file_upload_response})")
-                                notifications.append(
-                                    NotificationManager.create_attachment_notification(
-                                        "upload", file_name, "error", f"Upload failed (Status: {file_upload_response})"
-                                    )
-                                )
-                    
-                    if testcase_steps:
-                        with st.spinner("Updating test steps...."):
-                            # Extract text content from Quill editor output
-                            if isinstance(testcase_steps, dict):
-                                # Quill editor returns a dict, extract the text/html content
-                                steps_text = testcase_steps.get('html', '') or testcase_steps.get('text', '') or str(testcase_steps)
-                            else:
-                                # If it's already a string, use it directly
-                                steps_text = str(testcase_steps)
-                            
-                            testcase.add_test_steps(tc, steps_text)
-                            st.success("✅ Test steps updated successfully")
-                            notifications.append(
-                                NotificationManager.create_test_steps_notification(
-                                    "updated", "success", "Test steps content updated"
-                                )
+                        )
+                    else:
+                        st.error(f"❌ {tc}: Failed to upload attachment (Status: {file_upload_response})")
+                        notifications.append(
+                            NotificationManager.create_attachment_notification(
+                                "upload", file_name, "error", f"Upload failed (Status: {file_upload_response})"
                             )
-                    
-                    # Display notifications
-                    if notifications:
-                        st.divider()
-                        NotificationManager.show_summary_banner(notifications)
-                        NotificationManager.display_notifications(notifications, "Field Updates")
-                        
-                        # Store notifications for potential future use
-                        NotificationManager.store_notifications(notifications)
-                    
-
-
+                        )
                 
-
+                if result['steps']:
+                    notifications.append(
+                        NotificationManager.create_test_steps_notification(
+                            "updated", "success", "Test steps content updated"
+                        )
+                    )
+            
+            st.dataframe(
+                [{
+                    'Test Case': result['test_case'],
+                    'Result': result['status'],
+                    'Fields Changed': ", ".join(label for label, _, _ in result['fields']) or "-",
+                    'Error': result['error'] or "",
+                    'Seconds': result['duration'],
+                } for result in results],
+                use_container_width=True,
+                hide_index=True,
+            )
+            
+            # Display notifications
+            if notifications:
+                st.divider()
+                NotificationManager.show_summary_banner(notifications)
+                NotificationManager.display_notifications(notifications, "Field Updates")
+                
+                # Store notifications for potential future use
+                NotificationManager.store_notifications(notifications)